@@ -0,0 +1,64 @@
+"""Compare the any(word in text) abuse scan with the Aho-Corasick matcher.
+
+Usage: python benchmarks/abuse_matcher.py [pattern counts...]
+"""
+import os
+import random
+import runpy
+import string
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nexichat.utils.ahocorasick import Automaton
+
+SIZES = [400, 5_000, 50_000]
+MESSAGES = 2_000
+SCAN_BUDGET = 20_000_000  # pattern checks per size by the scan run
+
+
+def make_patterns(size: int, rnd: random.Random):
+    # abuse.py only defines the list; load it without importing the database package
+    words = list(runpy.run_path(os.path.join(ROOT, "nexichat", "database", "abuse.py"))["abuse_list"])
+    while len(words) < size:
+        words.append("".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(4, 9))))
+    return words[:size]
+
+
+def make_messages(rnd: random.Random):
+    vocab = ["".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(1, 8))) for _ in range(5_000)]
+    return [" ".join(rnd.choice(vocab) for _ in range(rnd.randint(2, 15))) for _ in range(MESSAGES)]
+
+
+def scan(patterns, text):
+    return any(word in text for word in patterns)
+
+
+def timed(func, messages):
+    start = time.perf_counter()
+    hits = sum(1 for text in messages if func(text))
+    return (time.perf_counter() - start) / len(messages), hits
+
+
+def main(sizes):
+    rnd = random.Random(0)
+    messages = make_messages(rnd)
+    print(f"{'patterns':>10} {'build ms':>9} {'scan us/msg':>12} {'matcher us/msg':>15} {'speedup':>8}")
+    for size in sizes:
+        patterns = make_patterns(size, rnd)
+        start = time.perf_counter()
+        matcher = Automaton(patterns)
+        build = time.perf_counter() - start
+
+        scan_messages = messages[: max(SCAN_BUDGET // size // 10, 20)]
+        scanned, expected = timed(lambda text: scan(patterns, text), scan_messages)
+        matched, hits = timed(matcher.search, scan_messages)
+        assert hits == expected
+        matched, _ = timed(matcher.search, messages)
+        print(f"{size:>10} {build * 1e3:>9.0f} {scanned * 1e6:>12.1f} {matched * 1e6:>15.1f} {scanned / matched:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
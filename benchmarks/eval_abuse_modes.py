@@ -0,0 +1,88 @@
+"""Replay a message dump through the abuse filter under each match mode.
+
+Usage: python benchmarks/eval_abuse_modes.py <dump> [blocked words]
+
+The dump is either a Telegram Desktop JSON export (result.json) or a text
+file with one message per line. The optional blocked words file holds one
+"<word> [token|substring]" per line, as /block takes them.
+
+Modes:
+  legacy     lowercase substring scan without normalization (before user-012)
+  substring  every pattern matched anywhere in the normalized text
+  token      every pattern matched as whole tokens only
+  default    per-pattern modes, token for short entries (what the bot runs)
+"""
+import json
+import os
+import runpy
+import sys
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nexichat.utils.abuse import SUBSTRING, TOKEN, AbuseMatcher
+from nexichat.utils.ahocorasick import Automaton
+
+TOP = 10
+
+
+def load_messages(path: str):
+    with open(path, encoding="utf-8") as f:
+        if not path.endswith(".json"):
+            return [line.rstrip("\n") for line in f if line.strip()]
+        data = json.load(f)
+    messages = []
+    for message in data.get("messages", []):
+        text = message.get("text")
+        if isinstance(text, list):
+            text = "".join(part if isinstance(part, str) else part.get("text", "") for part in text)
+        if text:
+            messages.append(text)
+    return messages
+
+
+def load_words(path):
+    # abuse.py only defines the list; load it without importing the database package
+    words = [(word, None) for word in runpy.run_path(os.path.join(ROOT, "nexichat", "database", "abuse.py"))["abuse_list"]]
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if parts:
+                    words.append((parts[0].lower(), parts[1].lower() if len(parts) > 1 else None))
+    return words
+
+
+def legacy_match(automaton: Automaton, text: str):
+    for _, pattern in automaton.finditer(text.lower()):
+        return pattern
+    return None
+
+
+def main(dump: str, words_path=None):
+    messages = load_messages(dump)
+    words = load_words(words_path)
+    legacy = Automaton(word.lower() for word, _ in words)
+    matchers = {
+        "legacy": lambda text: legacy_match(legacy, text),
+        "substring": AbuseMatcher((word, SUBSTRING) for word, _ in words).match,
+        "token": AbuseMatcher((word, TOKEN) for word, _ in words).match,
+        "default": AbuseMatcher(words).match,
+    }
+    print(f"messages: {len(messages)}, patterns: {len(words)}")
+    for name, match in matchers.items():
+        culprits = Counter()
+        for text in messages:
+            pattern = match(text)
+            if pattern is not None:
+                culprits[pattern] += 1
+        rejected = sum(culprits.values())
+        top = ", ".join(f"{pattern} {count}" for pattern, count in culprits.most_common(TOP))
+        print(f"{name:>10}: rejected {rejected} ({rejected / max(len(messages), 1):.1%})  top: {top}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    main(*sys.argv[1:3])
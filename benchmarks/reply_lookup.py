@@ -0,0 +1,56 @@
+"""Compare the old list-scan reply lookup with ReplyIndex.
+
+Usage: python benchmarks/reply_lookup.py [sizes...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nexichat.utils.replyindex import Reply, ReplyIndex
+
+SIZES = [10_000, 100_000, 1_000_000]
+SCAN_BUDGET = 20_000_000  # entries touched per size by the list-scan run
+
+
+def make_corpus(size: int):
+    words = [f"trigger {i}" for i in range(max(size // 5, 1))]
+    return [
+        {"word": random.choice(words), "text": f"reply {i}", "check": "none"}
+        for i in range(size)
+    ], words
+
+
+def scan_lookup(replies_cache, word):
+    relevant_replies = [reply for reply in replies_cache if reply["word"] == word]
+    if not relevant_replies:
+        relevant_replies = replies_cache
+    return random.choice(relevant_replies) if relevant_replies else None
+
+
+def timed(func, queries):
+    start = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main(sizes):
+    print(f"{'entries':>10} {'scan us/op':>12} {'index us/op':>12} {'speedup':>10}")
+    for size in sizes:
+        corpus, words = make_corpus(size)
+        index = ReplyIndex("exact")
+        index.load(Reply.from_document(doc) for doc in corpus)
+        misses = [f"unknown {i}" for i in range(len(words) // 10 + 1)]
+        queries = [random.choice(words) if i % 2 else random.choice(misses) for i in range(10_000)]
+
+        scan_queries = queries[: max(SCAN_BUDGET // size, 5)]
+        scan = timed(lambda word: scan_lookup(corpus, word), scan_queries)
+        indexed = timed(index.get, queries)
+        print(f"{size:>10} {scan * 1e6:>12.1f} {indexed * 1e6:>12.2f} {scan / indexed:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
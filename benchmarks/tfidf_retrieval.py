@@ -0,0 +1,63 @@
+"""Throughput and memory of the tfidf reply strategy.
+
+Usage: python benchmarks/tfidf_retrieval.py [pairs] [batch size]
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nexichat.utils.replyindex import Reply, ReplyIndex
+
+PAIRS = 100_000
+BATCH = 256
+QUERIES = 5_000
+
+
+def make_corpus(pairs: int, rnd: random.Random):
+    vocab = ["".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(2, 8))) for _ in range(20_000)]
+    words = [" ".join(rnd.choice(vocab) for _ in range(rnd.randint(1, 4))) for _ in range(max(pairs // 3, 1))]
+    return [Reply(rnd.choice(words), f"reply {i}") for i in range(pairs)], words
+
+
+def typo(word: str, rnd: random.Random) -> str:
+    chars = list(word)
+    chars[rnd.randrange(len(chars))] = rnd.choice(string.ascii_lowercase)
+    return "".join(chars)
+
+
+def main(pairs: int, batch: int):
+    rnd = random.Random(0)
+    corpus, words = make_corpus(pairs, rnd)
+
+    start = time.perf_counter()
+    index = ReplyIndex("tfidf")
+    index.load(corpus)
+    build = time.perf_counter() - start
+    tfidf = index.tfidf
+    queries = [typo(rnd.choice(words), rnd) for _ in range(QUERIES)]
+
+    start = time.perf_counter()
+    for query in queries[:1000]:
+        tfidf.search_batch([query], index.tfidf_threshold)
+    single = 1000 / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    hits = 0
+    for offset in range(0, len(queries), batch):
+        hits += sum(1 for match in tfidf.search_batch(queries[offset:offset + batch], index.tfidf_threshold) if match)
+    batched = len(queries) / (time.perf_counter() - start)
+
+    print(f"pairs: {pairs}, distinct triggers: {len(tfidf)}, vocabulary: {len(tfidf.vocab)}")
+    print(f"build: {build:.2f}s")
+    print(f"single queries: {single:,.0f}/s")
+    print(f"batched queries ({batch}): {batched:,.0f}/s, matched {hits / len(queries):.0%} of typo queries")
+    print(f"matrix memory: {tfidf.nbytes() / 2**20:.1f} MiB, {tfidf.nbytes() * 100_000 / pairs / 2**20:.1f} MiB per 100k pairs")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [PAIRS, BATCH][len(args):]))
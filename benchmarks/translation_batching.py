@@ -0,0 +1,65 @@
+"""Backend calls per 1k translated replies with and without a coalescing window.
+
+Usage: python benchmarks/translation_batching.py [messages per second] [messages]
+
+Replies needing translation arrive as a Poisson stream spread over a few
+chat languages and go to the local stand-in backend, which answers after a
+fixed simulated round trip. Every reply is distinct, so this measures what
+batching saves on cache misses alone.
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nexichat.utils.translation import BatchQueue, LocalBackend
+
+LANGS = {"hi": 0.5, "en": 0.3, "ta": 0.1, "bn": 0.1}
+LATENCY = 0.05  # simulated round trip of the backend
+WINDOWS = [None, 0.002, 0.005, 0.02]  # None: one call per reply, as before batching
+
+
+async def run(window, rate: float, messages: int):
+    rnd = random.Random(0)
+    backend = LocalBackend(latency=LATENCY)
+    batches = BatchQueue(backend, window) if window is not None else None
+    latencies = []
+
+    async def reply(i: int, lang: str):
+        start = time.perf_counter()
+        text = f"reply {i}"
+        if batches is None:
+            await backend.translate_batch([text], lang)
+        else:
+            await batches.translate(text, lang)
+        latencies.append(time.perf_counter() - start)
+
+    tasks = []
+    langs, weights = list(LANGS), list(LANGS.values())
+    start = time.perf_counter()
+    for i in range(messages):
+        await asyncio.sleep(rnd.expovariate(rate))
+        tasks.append(asyncio.ensure_future(reply(i, rnd.choices(langs, weights)[0])))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    calls = batches.calls if batches is not None else messages
+    latencies.sort()
+    return calls, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)], messages / elapsed
+
+
+def main(rate: float = 200, messages: int = 1000):
+    print(f"{messages} replies at {rate:.0f}/s, backend round trip {LATENCY * 1e3:.0f} ms")
+    print(f"{'window ms':>10} {'calls/1k':>9} {'saved/1k':>9} {'p50 ms':>7} {'p95 ms':>7} {'msgs/s':>7}")
+    for window in WINDOWS:
+        calls, p50, p95, throughput = asyncio.run(run(window, rate, messages))
+        per_1k = calls * 1000 / messages
+        label = "off" if window is None else f"{window * 1e3:g}"
+        print(f"{label:>10} {per_1k:>9.0f} {1000 - per_1k:>9.0f} {p50 * 1e3:>7.1f} {p95 * 1e3:>7.1f} {throughput:>7.0f}")
+
+
+if __name__ == "__main__":
+    main(*[float(arg) for arg in sys.argv[1:2]], *[int(arg) for arg in sys.argv[2:3]])
@@ -17,6 +17,52 @@ UPSTREAM_BRANCH = getenv("UPSTREAM_BRANCH", "main")
 SUPPORT_GRP = "ll_KINGDOM_ll"
 UPDATE_CHNL = "ll_IMPERIAL_ll"
 OWNER_USERNAME = "ll_BRANDED_ll"
+# How unknown messages are matched to learned triggers: exact, fuzzy or tfidf (needs numpy + scipy)
+REPLY_STRATEGY = getenv("REPLY_STRATEGY", "fuzzy")
+# Similarity (0-1) an unknown message needs to reuse a learned trigger, 0 disables matching
+FUZZY_THRESHOLD = float(getenv("FUZZY_THRESHOLD", "0.5"))
+TFIDF_THRESHOLD = float(getenv("TFIDF_THRESHOLD", "0.4"))
+# False-positive rate (e.g. 0.01) of an optional Bloom filter over learned triggers, 0 disables it
+BLOOM_ERROR_RATE = float(getenv("BLOOM_ERROR_RATE", "0"))
+# Seconds between polls for pairs learned by other processes (when change streams are unavailable)
+REPLY_SYNC_INTERVAL = int(getenv("REPLY_SYNC_INTERVAL", "30"))
+# Newly learned pairs are saved in batches of this size, or after this many seconds
+REPLY_FLUSH_SIZE = int(getenv("REPLY_FLUSH_SIZE", "200"))
+REPLY_FLUSH_INTERVAL = float(getenv("REPLY_FLUSH_INTERVAL", "5"))
+# Seconds between writes of reply usage counters, which weight reply selection
+REPLY_COUNT_INTERVAL = float(getenv("REPLY_COUNT_INTERVAL", "60"))
+# On-disk copy of the learned-reply corpus for fast restarts, empty disables it
+REPLY_SNAPSHOT = getenv("REPLY_SNAPSHOT", "cache/replies.snap")
+# Seconds between snapshot refreshes while the bot runs
+REPLY_SNAPSHOT_INTERVAL = int(getenv("REPLY_SNAPSHOT_INTERVAL", "900"))
+# New user/chat ids are saved in batches of this size, or after this many seconds
+SERVED_FLUSH_SIZE = int(getenv("SERVED_FLUSH_SIZE", "500"))
+SERVED_FLUSH_INTERVAL = float(getenv("SERVED_FLUSH_INTERVAL", "5"))
+# Seconds between checks for abuse words blocked by other processes
+ABUSE_SYNC_INTERVAL = float(getenv("ABUSE_SYNC_INTERVAL", "5"))
+# Memory (bytes) for translated replies, and days translations are kept in the database
+TRANSLATION_CACHE_BYTES = int(getenv("TRANSLATION_CACHE_BYTES", str(16 * 2**20)))
+TRANSLATION_CACHE_TTL = float(getenv("TRANSLATION_CACHE_TTL", "30"))
+# Translation backend: google, or local (offline stand-in for load tests, replies tagged with the language)
+TRANSLATION_BACKEND = getenv("TRANSLATION_BACKEND", "google")
+# Simulated round trip (seconds) of the local backend
+TRANSLATION_LOCAL_LATENCY = float(getenv("TRANSLATION_LOCAL_LATENCY", "0"))
+# Seconds translation requests for the same language are held to be sent as one batch
+TRANSLATION_BATCH_WINDOW = float(getenv("TRANSLATION_BATCH_WINDOW", "0.005"))
+# Threads for translation calls, and seconds a reply waits for its translation
+TRANSLATION_WORKERS = int(getenv("TRANSLATION_WORKERS", "4"))
+TRANSLATION_TIMEOUT = float(getenv("TRANSLATION_TIMEOUT", "3"))
+# Consecutive translation failures that pause translating, and for how many seconds
+TRANSLATION_BREAKER_FAILURES = int(getenv("TRANSLATION_BREAKER_FAILURES", "5"))
+TRANSLATION_BREAKER_RESET = float(getenv("TRANSLATION_BREAKER_RESET", "30"))
+# Pre-translation of the top replies into the top chat languages: seconds between rounds, sizes, lookups per second (0 disables)
+TRANSLATION_WARM_INTERVAL = float(getenv("TRANSLATION_WARM_INTERVAL", "600"))
+TRANSLATION_WARM_REPLIES = int(getenv("TRANSLATION_WARM_REPLIES", "200"))
+TRANSLATION_WARM_LANGS = int(getenv("TRANSLATION_WARM_LANGS", "5"))
+TRANSLATION_WARM_RATE = float(getenv("TRANSLATION_WARM_RATE", "1"))
+# Seconds chat language/chatbot status are cached, and how long "not set" is cached
+SETTINGS_CACHE_TTL = float(getenv("SETTINGS_CACHE_TTL", "300"))
+SETTINGS_NEGATIVE_TTL = float(getenv("SETTINGS_NEGATIVE_TTL", "60"))
 # GIT TOKEN ( if your edited repo is private)
 GIT_TOKEN = getenv("GIT_TOKEN", "")
     
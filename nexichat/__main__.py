@@ -10,6 +10,12 @@ from pyrogram import idle
 from pyrogram.types import BotCommand
 from config import OWNER_ID
 from nexichat import LOGGER, nexichat, userbot, load_clone_owners
+from nexichat.database.abusewords import start_abuse_sync
+from nexichat.database.clonestats import start_clone_migration
+from nexichat.database.indexes import ensure_indexes
+from nexichat.database.replies import flush_replies, save_snapshot, start_reply_sync
+from nexichat.database.served import flush_served, start_served_sync
+from nexichat.database.translations import flush_translations, start_translation_warmer
 from nexichat.modules import ALL_MODULES
 from nexichat.modules.Clone import restart_bots
 from nexichat.modules.Id_Clone import restart_idchatbots
@@ -36,6 +42,21 @@ async def anony_boot():
         except Exception as ex:
             LOGGER.warning(f"Failed to send start message to owner: {ex}")
 
+        # Build the indexes the database modules declare before anything queries them
+        try:
+            await ensure_indexes()
+        except Exception as ex:
+            LOGGER.error(f"Failed to ensure indexes: {ex}")
+
+        # Keep the learned-reply corpus and the abuse words in sync with other processes
+        start_reply_sync()
+        start_abuse_sync()
+        # Know which users and chats are stored, so only new ones are written
+        start_served_sync()
+        start_clone_migration()
+        # Pre-translate the most used replies for the busiest chat languages
+        start_translation_warmer()
+
         # Start additional services
         await asyncio.gather(
             restart_bots(),
@@ -91,6 +112,10 @@ async def anony_boot():
         LOGGER.error(f"Failed to start nexichat: {ex}")
     finally:
         LOGGER.info("Stopping nexichat Bot...")
+        await flush_replies()
+        await flush_served()
+        await flush_translations()
+        await save_snapshot()
         await nexichat.stop()
         if config.STRING1:
             await userbot.stop()
@@ -100,6 +125,10 @@ def signal_handler(signal, frame):
     asyncio.get_event_loop().create_task(shutdown())
 
 async def shutdown():
+    await flush_replies()
+    await flush_served()
+    await flush_translations()
+    await save_snapshot()
     await nexichat.stop()
     if config.STRING1:
         await userbot.stop()
@@ -1,7 +1,13 @@
 import config
+from .indexes import *
+from .served import *
 from .chats import *
 from .users import *
 from .clonestats import *
 from .storage import *
 from .sudoers import *
 from .abuse import *
+from .abusewords import *
+from .replies import *
+from .settings import *
+from .translations import *
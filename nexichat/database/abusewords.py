@@ -0,0 +1,130 @@
+import asyncio
+from typing import Callable, List, Optional
+
+from pymongo import ReturnDocument
+
+from config import ABUSE_SYNC_INTERVAL
+from nexichat import LOGGER, db, mongo_client
+from nexichat.database.abuse import abuse_list
+from nexichat.database.indexes import register_index
+from nexichat.utils.abuse import AbuseFilter
+
+abuse_words_db = db.abuse_words_db.words
+register_index(abuse_words_db, "word")
+# {"_id": "abuse_words", "version": n}, bumped on every change to the list
+abuse_stamp_db = db.abuse_words_db.stamp
+# Where the clone plugins used to keep their own list
+legacy_abuse_words_db = mongo_client.nexichat.abuse_words
+
+STAMP_ID = "abuse_words"
+
+# One filter per process, shared by the modules, mplugin and idchatbot trees
+abuse_filter = AbuseFilter(abuse_list)
+abuse_lock = asyncio.Lock()
+abuse_task: Optional[asyncio.Task] = None
+# Called after every change to the loaded words, including the first load
+abuse_watchers: List[Callable[[], None]] = []
+
+
+async def merge_legacy_abuse_words():
+    """Copy the clone plugins' old word list into the shared one, once"""
+    stamp = await abuse_stamp_db.find_one({"_id": STAMP_ID})
+    if stamp and stamp.get("merged"):
+        return
+    merged = 0
+    async for doc in legacy_abuse_words_db.find():
+        await abuse_words_db.update_one(
+            {"word": doc["word"]}, {"$setOnInsert": {"mode": doc.get("mode")}}, upsert=True
+        )
+        merged += 1
+    await abuse_stamp_db.update_one(
+        {"_id": STAMP_ID}, {"$set": {"merged": True}, "$inc": {"version": 1}}, upsert=True
+    )
+    if merged:
+        LOGGER.info(f"Merged {merged} abuse words from the clone plugins' list")
+
+
+def _apply(words: dict, version: int):
+    abuse_filter.update(words, version)
+    for watcher in list(abuse_watchers):
+        try:
+            watcher()
+        except Exception as e:
+            LOGGER.warning(f"Abuse word watcher failed: {e}")
+
+
+async def _stamp() -> int:
+    stamp = await abuse_stamp_db.find_one({"_id": STAMP_ID})
+    return stamp.get("version", 0) if stamp else 0
+
+
+async def _load(force: bool = False):
+    if abuse_filter.version is None:
+        await merge_legacy_abuse_words()
+    # Read the stamp first: a change made meanwhile moves it again
+    version = await _stamp()
+    if version == abuse_filter.version and not force:
+        return
+    words = {doc["word"]: doc.get("mode") async for doc in abuse_words_db.find()}
+    _apply(words, version)
+    LOGGER.info(f"Loaded {len(words)} abuse words (version {version})")
+
+
+async def load_abuse_words(force: bool = False):
+    """Load the blocked words if the stamp moved since the last load"""
+    async with abuse_lock:
+        await _load(force)
+
+
+async def _bump(words: dict):
+    """Move the stamp after a change; apply it locally unless another process changed the list too"""
+    stamp = await abuse_stamp_db.find_one_and_update(
+        {"_id": STAMP_ID}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    if stamp["version"] == abuse_filter.version + 1:
+        _apply(words, stamp["version"])
+    else:
+        await _load()
+
+
+async def add_abuse_word(word: str, mode: Optional[str] = None):
+    async with abuse_lock:
+        await _load()
+        if word in abuse_filter and abuse_filter.words[word] == mode:
+            return
+        await abuse_words_db.update_one({"word": word}, {"$set": {"mode": mode}}, upsert=True)
+        await _bump(dict(abuse_filter.words, **{word: mode}))
+
+
+async def remove_abuse_word(word: str) -> bool:
+    """Unblock a word, returns False if it was not blocked"""
+    async with abuse_lock:
+        await _load()
+        if word not in abuse_filter:
+            return False
+        await abuse_words_db.delete_one({"word": word})
+        words = dict(abuse_filter.words)
+        del words[word]
+        await _bump(words)
+        return True
+
+
+async def is_abuse_present(text: str) -> bool:
+    if abuse_filter.version is None:
+        await load_abuse_words()
+    return abuse_filter.search(text)
+
+
+async def watch_abuse_words():
+    while True:
+        try:
+            await load_abuse_words()
+        except Exception as e:
+            LOGGER.error(f"Error reloading abuse words: {e}")
+        await asyncio.sleep(ABUSE_SYNC_INTERVAL)
+
+
+def start_abuse_sync():
+    global abuse_task
+    if abuse_task is None or abuse_task.done():
+        abuse_task = asyncio.get_event_loop().create_task(watch_abuse_words())
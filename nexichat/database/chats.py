@@ -1,8 +1,11 @@
 from nexichat import db
+from nexichat.database.served import ServedIds
 
 chatsdb = db.chatsdb
+served_chats = ServedIds("served chats", chatsdb, "chat_id", positive=False)
 
 async def get_served_chats() -> list:
+    await served_chats.flush()
     chats = chatsdb.find({"chat_id": {"$lt": 0}})
     if not chats:
         return []
@@ -12,22 +15,17 @@ async def get_served_chats() -> list:
     return chats_list
 
 
+async def get_served_chats_count() -> int:
+    return await served_chats.count()
+
+
 async def is_served_chat(chat_id: int) -> bool:
-    chat = await chatsdb.find_one({"chat_id": chat_id})
-    if not chat:
-        return False
-    return True
+    return await served_chats.contains(chat_id)
 
 
 async def add_served_chat(chat_id: int):
-    is_served = await is_served_chat(chat_id)
-    if is_served:
-        return
-    return await chatsdb.insert_one({"chat_id": chat_id})
+    served_chats.add(chat_id)
 
 
 async def remove_served_chat(chat_id: int):
-    is_served = await is_served_chat(chat_id)
-    if not is_served:
-        return
-    return await chatsdb.delete_one({"chat_id": chat_id})
+    await served_chats.remove(chat_id)
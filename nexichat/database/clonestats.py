@@ -1,48 +1,143 @@
+import asyncio
+import re
+from typing import Dict, Optional
+
+from nexichat import LOGGER, clone_db
 from nexichat import db as mongodb
+from nexichat.database.indexes import register_index
+from nexichat.database.served import ServedIds
+from nexichat.utils.scoped import ScopedCollection
 
 cloneownerdb = mongodb.cloneownerdb
 clonebotdb = mongodb.clonebotdb
+idclonebotdb = mongodb.idclonebotdb
+# Clone owners as the clone plugins keep them, by bot_id (bots) or clone_id (id-chatbots)
+clone_owners = mongodb.clone_owners
+
+register_index(clonebotdb, "token")
+register_index(idclonebotdb, "session")
+register_index(clone_owners, "bot_id")
+register_index(clone_owners, "clone_id")
+register_index(clone_db, "bot_id")
+
+# Users and chats of every clone, one document per (bot_id, id)
+clone_users = mongodb.clone_users
+clone_chats = mongodb.clone_chats
+register_index(clone_users, ["bot_id", "user_id"], unique=True)
+register_index(clone_chats, ["bot_id", "chat_id"], unique=True)
+
+# Per clone, created and warmed on its first message
+cloned_users: Dict[int, ServedIds] = {}
+cloned_chats: Dict[int, ServedIds] = {}
+
+# Collections clones used to get for themselves, moved into the shared ones
+PER_BOT_COLLECTION = re.compile(r"^(\d+)_(users|chats)$")
+CLONE_MIGRATION_BATCH = 1000
+clone_migration_task: Optional[asyncio.Task] = None
 
 def get_bot_users_collection(bot_id):
-    from nexichat import db as mongodb
-    return mongodb[f"{bot_id}_users"]
+    return ScopedCollection(clone_users, {"bot_id": bot_id})
 
 def get_bot_chats_collection(bot_id):
-    from nexichat import db as mongodb
-    return mongodb[f"{bot_id}_chats"]
+    return ScopedCollection(clone_chats, {"bot_id": bot_id})
+
+def _served_cusers(bot_id) -> ServedIds:
+    tracker = cloned_users.get(bot_id)
+    if tracker is None:
+        tracker = cloned_users[bot_id] = ServedIds(f"users of {bot_id}", clone_users, "user_id", {"bot_id": bot_id})
+    return tracker
+
+def _served_cchats(bot_id) -> ServedIds:
+    tracker = cloned_chats.get(bot_id)
+    if tracker is None:
+        tracker = cloned_chats[bot_id] = ServedIds(
+            f"chats of {bot_id}", clone_chats, "chat_id", {"bot_id": bot_id}, positive=False
+        )
+    return tracker
 
 async def is_served_cuser(bot_id, user_id: int) -> bool:
-    usersdb = get_bot_users_collection(bot_id)
-    user = await usersdb.find_one({"user_id": user_id})
-    if not user:
-        return False
-    return True
+    return await _served_cusers(bot_id).contains(user_id)
 
 async def add_served_cuser(bot_id, user_id: int):
-    usersdb = get_bot_users_collection(bot_id)
-    is_served = await is_served_cuser(bot_id, user_id)
-    if is_served:
-        return
-    return await usersdb.insert_one({"user_id": user_id})
+    _served_cusers(bot_id).add(user_id)
 
 async def get_served_cusers(bot_id) -> list:
+    await _served_cusers(bot_id).flush()
     usersdb = get_bot_users_collection(bot_id)
     return await usersdb.find({"user_id": {"$gt": 0}}).to_list(length=None)
 
+async def get_served_cusers_count(bot_id) -> int:
+    return await _served_cusers(bot_id).count()
+
 async def is_served_cchat(bot_id, chat_id: int) -> bool:
-    chatsdb = get_bot_chats_collection(bot_id)
-    chat = await chatsdb.find_one({"chat_id": chat_id})
-    if not chat:
-        return False
-    return True
+    return await _served_cchats(bot_id).contains(chat_id)
 
 async def add_served_cchat(bot_id, chat_id: int):
-    chatsdb = get_bot_chats_collection(bot_id)
-    is_served = await is_served_cchat(bot_id, chat_id)
-    if is_served:
-        return
-    return await chatsdb.insert_one({"chat_id": chat_id})
+    _served_cchats(bot_id).add(chat_id)
 
 async def get_served_cchats(bot_id) -> list:
+    await _served_cchats(bot_id).flush()
     chatsdb = get_bot_chats_collection(bot_id)
     return await chatsdb.find({"chat_id": {"$lt": 0}}).to_list(length=None)
+
+async def get_served_cchats_count(bot_id) -> int:
+    return await _served_cchats(bot_id).count()
+
+async def move_bot_collection(name: str) -> int:
+    """Copy one {bot_id}_users / {bot_id}_chats collection into the shared one and drop it
+
+    Copies are upserts on the unique (bot_id, id) index, so a move cut
+    short by a restart is repeated from the start without duplicates.
+    """
+    match = PER_BOT_COLLECTION.match(name)
+    bot_id = int(match[1])
+    tracker = _served_cusers(bot_id) if match[2] == "users" else _served_cchats(bot_id)
+    await tracker.ensure_index()
+    source = mongodb[name]
+    field = tracker.field
+    last_id = None
+    moved = failed = 0
+    while True:
+        query = {} if last_id is None else {"_id": {"$gt": last_id}}
+        docs = await (
+            source.find(query, {field: 1})
+            .sort("_id", 1)
+            .limit(CLONE_MIGRATION_BATCH)
+            .to_list(length=CLONE_MIGRATION_BATCH)
+        )
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        ids = [doc[field] for doc in docs if tracker.accepts(doc.get(field))]
+        if ids:
+            failed += await tracker.save([{"bot_id": bot_id, field: value} for value in ids])
+            moved += len(ids)
+            if tracker.loaded:
+                tracker.seen.update(ids)
+        await asyncio.sleep(0)
+    if failed:
+        LOGGER.warning(f"Kept {name}: {failed} of {moved} ids not moved")
+        return 0
+    await source.drop()
+    return moved
+
+async def migrate_clone_stats():
+    """One-shot migration of every per-clone collection, resumed on the next start if cut short"""
+    try:
+        names = await mongodb.list_collection_names(filter={"name": {"$regex": PER_BOT_COLLECTION.pattern}})
+    except Exception as e:
+        LOGGER.error(f"Error listing clone collections: {e}")
+        return
+    moved = 0
+    for name in sorted(names):
+        try:
+            moved += await move_bot_collection(name)
+        except Exception as e:
+            LOGGER.error(f"Error moving {name}: {e}")
+    if names:
+        LOGGER.info(f"Moved {moved} clone users/chats from {len(names)} per-clone collections")
+
+def start_clone_migration():
+    global clone_migration_task
+    if clone_migration_task is None or clone_migration_task.done():
+        clone_migration_task = asyncio.get_event_loop().create_task(migrate_clone_stats())
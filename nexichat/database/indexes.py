@@ -0,0 +1,146 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from pymongo.errors import OperationFailure
+
+from nexichat import LOGGER
+
+DUPLICATE_KEY = 11000
+
+Keys = List[Tuple[str, int]]
+
+
+class IndexSpec:
+    """An index the code relies on, declared next to the collection it is on
+
+    on_duplicates, for unique indexes over data written before them,
+    removes the duplicates that keep the index from being built and
+    returns how many it removed.
+    """
+
+    __slots__ = ("collection", "keys", "options", "on_duplicates", "built")
+
+    def __init__(self, collection, keys: Keys, options: Dict[str, Any],
+                 on_duplicates: Optional[Callable[[], Awaitable[int]]] = None):
+        self.collection = collection
+        self.keys = keys
+        self.options = options
+        self.on_duplicates = on_duplicates
+        self.built = False
+
+    @property
+    def label(self) -> str:
+        fields = ", ".join(key for key, _ in self.keys)
+        return f"{getattr(self.collection, 'full_name', '?')} ({fields})"
+
+
+# Every declared index, in declaration order
+index_registry: List[IndexSpec] = []
+
+
+def _normalize(keys: Union[str, Sequence]) -> Keys:
+    if isinstance(keys, str):
+        return [(keys, 1)]
+    return [(key, 1) if isinstance(key, str) else (key[0], key[1]) for key in keys]
+
+
+def register_index(collection, keys: Union[str, Sequence], *,
+                   on_duplicates: Optional[Callable[[], Awaitable[int]]] = None, **options) -> IndexSpec:
+    """Declare an index, returns the existing spec if the same one was declared before"""
+    keys = _normalize(keys)
+    for spec in index_registry:
+        if spec.collection is collection and spec.keys == keys:
+            if spec.on_duplicates is None:
+                spec.on_duplicates = on_duplicates
+            return spec
+    spec = IndexSpec(collection, keys, options, on_duplicates)
+    index_registry.append(spec)
+    return spec
+
+
+async def build_index(spec: IndexSpec) -> float:
+    """Create one declared index if needed, returns the seconds spent"""
+    if spec.built:
+        return 0.0
+    start = time.perf_counter()
+    try:
+        await spec.collection.create_index(spec.keys, **spec.options)
+    except OperationFailure as e:
+        if e.code != DUPLICATE_KEY or spec.on_duplicates is None:
+            raise
+        removed = await spec.on_duplicates()
+        LOGGER.info(f"Removed {removed} duplicates blocking index {spec.label}")
+        await spec.collection.create_index(spec.keys, **spec.options)
+    spec.built = True
+    return time.perf_counter() - start
+
+
+async def _existing(collection) -> Dict[Tuple[Tuple[str, Any], ...], str]:
+    info = await collection.index_information()
+    # Directions may come back as floats (1.0) from indexes built by other drivers
+    return {
+        tuple((key, int(direction) if isinstance(direction, float) else direction) for key, direction in index["key"]): name
+        for name, index in info.items()
+    }
+
+
+async def _unused(collection) -> List[str]:
+    """Indexes not used since the server started, if the server tells us"""
+    try:
+        return [
+            stats["name"]
+            async for stats in collection.aggregate([{"$indexStats": {}}])
+            if stats["name"] != "_id_" and not stats.get("accesses", {}).get("ops")
+        ]
+    except Exception:
+        return []
+
+
+async def ensure_indexes() -> Dict[str, list]:
+    """Build every declared index that is missing and report on the rest
+
+    Idempotent: indexes already in place cost one index listing per
+    collection. The report names indexes built now (with seconds spent),
+    ones that failed, ones found on a collection but not declared, and
+    ones the server says were never used since it started.
+    """
+    report: Dict[str, list] = {"built": [], "present": [], "failed": [], "undeclared": [], "unused": []}
+    collections: Dict[int, Tuple[Any, Dict]] = {}
+    for spec in index_registry:
+        key = id(spec.collection)
+        if key not in collections:
+            try:
+                collections[key] = (spec.collection, await _existing(spec.collection))
+            except Exception as e:
+                collections[key] = (spec.collection, {})
+                LOGGER.warning(f"Could not list indexes of {spec.label}: {e}")
+        existing = collections[key][1]
+        found = existing.pop(tuple(spec.keys), None)
+        try:
+            seconds = await build_index(spec)
+        except Exception as e:
+            report["failed"].append((spec.label, str(e)))
+            continue
+        if found is None:
+            report["built"].append((spec.label, seconds))
+        else:
+            report["present"].append(spec.label)
+    for collection, existing in collections.values():
+        name = getattr(collection, "full_name", "?")
+        report["undeclared"].extend(f"{name}.{index}" for index in existing.values() if index != "_id_")
+        report["unused"].extend(f"{name}.{index}" for index in await _unused(collection))
+
+    total = sum(seconds for _, seconds in report["built"])
+    LOGGER.info(
+        f"Indexes: {len(report['present'])} present, {len(report['built'])} built in {total:.2f}s, "
+        f"{len(report['failed'])} failed"
+    )
+    for label, seconds in report["built"]:
+        LOGGER.info(f"Built index {label} in {seconds:.2f}s")
+    for label, error in report["failed"]:
+        LOGGER.warning(f"Missing index {label}: {error}")
+    if report["undeclared"]:
+        LOGGER.info(f"Indexes not declared in code: {', '.join(report['undeclared'])}")
+    if report["unused"]:
+        LOGGER.info(f"Indexes unused since the server started: {', '.join(report['unused'])}")
+    return report
@@ -0,0 +1,549 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from config import (
+    BLOOM_ERROR_RATE,
+    FUZZY_THRESHOLD,
+    REPLY_COUNT_INTERVAL,
+    REPLY_FLUSH_INTERVAL,
+    REPLY_FLUSH_SIZE,
+    REPLY_SNAPSHOT,
+    REPLY_SNAPSHOT_INTERVAL,
+    REPLY_STRATEGY,
+    REPLY_SYNC_INTERVAL,
+    TFIDF_THRESHOLD,
+)
+from nexichat import LOGGER
+from nexichat.database.abusewords import abuse_filter, abuse_watchers
+from nexichat.database.indexes import build_index, register_index
+from nexichat.database.storage import CHAT_STORAGE_URL, chatai, jobs, migrations
+from nexichat.utils.abuse import AbuseMatcher
+from nexichat.utils.replyindex import MediaType, Reply, ReplyIndex
+from nexichat.utils.snapshot import SnapshotError, read_snapshot, write_snapshot
+from nexichat.utils.writebehind import WriteBehind
+
+# One corpus per process, shared by the modules, mplugin and idchatbot trees
+replies_cache = ReplyIndex(REPLY_STRATEGY, FUZZY_THRESHOLD, TFIDF_THRESHOLD, bloom_error_rate=BLOOM_ERROR_RATE)
+replies_loaded = asyncio.Event()
+replies_lock = asyncio.Lock()
+
+REPLY_FIELDS = {"word": 1, "text": 1, "check": 1, "media_type": 1, "uses": 1, "replied": 1}
+# ObjectIds from different processes are only ordered to the second, so a
+# cursor taken from a snapshot starts a short window behind its mark.
+SYNC_OVERLAP = timedelta(seconds=10)
+SYNC_BATCH = 500
+MIGRATION_BATCH = 1000
+# Bot messages remembered so that answers to them can be credited
+SENT_REPLIES = 10_000
+DUPLICATE_KEY = 11000
+PURGE_JOB = "reply_purge"
+PURGE_BATCH = 1000
+# Seconds between progress reports of a running purge
+PURGE_PROGRESS_INTERVAL = 5
+
+# Identifies the cluster and collection the corpus is read from, kept in the snapshot
+snapshot_source = hashlib.blake2b(f"{CHAT_STORAGE_URL} {chatai.full_name}".encode(), digest_size=16).digest()
+
+# Every stored pair up to this _id is in the corpus; syncs page on from it
+high_water: Optional[ObjectId] = None
+sync_lock = asyncio.Lock()
+sync_task: Optional[asyncio.Task] = None
+snapshot_task: Optional[asyncio.Task] = None
+catchup_task: Optional[asyncio.Task] = None
+migration_task: Optional[asyncio.Task] = None
+purge_task: Optional[asyncio.Task] = None
+evict_task: Optional[asyncio.Task] = None
+# Called with (scanned, deleted, done) while the current purge runs
+purge_watchers: List[Callable[[int, int, bool], Awaitable]] = []
+# (entries, high-water mark, counter changes) of the last snapshot written or read
+snapshot_mark = None
+# Bumped by every counter change, which moves neither entries nor the high-water mark
+count_generation = 0
+# Abuse word version the corpus was last checked against, None if never
+corpus_filtered: Optional[int] = None
+
+
+def _advance(doc_id):
+    global high_water
+    if isinstance(doc_id, ObjectId) and (high_water is None or doc_id > high_water):
+        high_water = doc_id
+
+
+async def catch_up_replies():
+    """Merge every pair inserted since the snapshot was written"""
+    while True:
+        try:
+            added = await sync_replies()
+            LOGGER.info(f"Caught up on {added} replies newer than the snapshot")
+            return
+        except Exception as e:
+            LOGGER.error(f"Error catching up on replies: {e}")
+            await asyncio.sleep(REPLY_SYNC_INTERVAL)
+
+
+async def load_snapshot() -> bool:
+    """Load the corpus from the on-disk snapshot, then catch up on newer pairs in the background"""
+    global high_water, snapshot_mark, catchup_task, corpus_filtered
+    if not REPLY_SNAPSHOT:
+        return False
+    loop = asyncio.get_running_loop()
+    try:
+        replies, mark, bloom, source, filtered = await loop.run_in_executor(None, read_snapshot, REPLY_SNAPSHOT)
+    except FileNotFoundError:
+        return False
+    except (OSError, SnapshotError) as e:
+        LOGGER.warning(f"Ignoring reply snapshot {REPLY_SNAPSHOT}: {e}")
+        return False
+    if mark is None:
+        return False
+    if source != snapshot_source:
+        LOGGER.info(f"Ignoring reply snapshot {REPLY_SNAPSHOT}: written from another database")
+        return False
+    high_water = ObjectId.from_datetime(ObjectId(mark).generation_time - SYNC_OVERLAP)
+    replies_cache.load(replies, bloom)
+    corpus_filtered = filtered
+    snapshot_mark = (len(replies_cache), high_water, count_generation, corpus_filtered)
+    LOGGER.info(f"Loaded {len(replies)} replies from snapshot")
+    catchup_task = loop.create_task(catch_up_replies())
+    return True
+
+
+async def save_snapshot(force: bool = False):
+    """Write the corpus to the on-disk snapshot if it changed since the last one"""
+    global snapshot_mark
+    if not REPLY_SNAPSHOT or not replies_loaded.is_set() or high_water is None:
+        return
+    mark = (len(replies_cache), high_water, count_generation, corpus_filtered)
+    if mark == snapshot_mark and not force:
+        return
+    replies_cache.compact()
+    replies = list(replies_cache.pool)
+    bloom = replies_cache.bloom.to_bytes() if replies_cache.bloom is not None else None
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(
+            None, write_snapshot, REPLY_SNAPSHOT, replies, high_water.binary, bloom, snapshot_source,
+            corpus_filtered,
+        )
+        snapshot_mark = mark
+    except OSError as e:
+        LOGGER.error(f"Error writing reply snapshot {REPLY_SNAPSHOT}: {e}")
+
+
+async def load_replies(force: bool = False):
+    async with replies_lock:
+        if replies_loaded.is_set() and not force:
+            return
+        if not force and await load_snapshot():
+            replies_loaded.set()
+            return
+        replies = []
+        async for doc in chatai.find({}, REPLY_FIELDS):
+            replies.append(Reply.from_document(doc))
+            _advance(doc["_id"])
+        replies_cache.load(replies)
+        replies_loaded.set()
+    await save_snapshot(force=True)
+
+
+async def get_learned_reply(word: Optional[str]) -> Optional[Reply]:
+    if not replies_loaded.is_set():
+        await load_replies()
+    return replies_cache.get(word)
+
+
+def reply_hash(reply: Reply) -> str:
+    """Stable content hash of a pair, the same for check and media_type documents"""
+    data = json.dumps([reply.word, reply.text, reply.check], ensure_ascii=False)
+    return hashlib.blake2b(data.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+# Partial, so documents written before hashes existed do not collide on null
+reply_index = register_index(chatai, "hash", unique=True, partialFilterExpression={"hash": {"$type": "string"}})
+
+
+async def ensure_reply_index():
+    await build_index(reply_index)
+
+
+async def insert_replies(docs):
+    requests = [UpdateOne({"hash": doc["hash"]}, {"$setOnInsert": doc}, upsert=True) for doc in docs]
+    try:
+        await chatai.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        # Unordered: everything but the failed documents was written. Concurrent
+        # upserts of the same pair lose the race on the unique index, which is fine.
+        errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY]
+        if errors:
+            LOGGER.warning(f"{len(errors)} of {len(docs)} replies not saved: {errors[0].get('errmsg')}")
+
+
+async def backfill_reply_hashes():
+    """One-shot migration: hash pairs stored before the unique index, dropping duplicates"""
+    if await migrations.find_one({"_id": "reply_hash"}):
+        return
+    await ensure_reply_index()
+    last_id = None
+    hashed = removed = 0
+    while True:
+        query = {"hash": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = await (
+            chatai.find(query, REPLY_FIELDS)
+            .sort("_id", 1)
+            .limit(MIGRATION_BATCH)
+            .to_list(length=MIGRATION_BATCH)
+        )
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        hashes = [reply_hash(Reply.from_document(doc)) for doc in docs]
+        taken = {
+            doc["hash"]
+            async for doc in chatai.find({"hash": {"$in": list(set(hashes))}}, {"hash": 1})
+        }
+        requests = []
+        for doc, content_hash in zip(docs, hashes):
+            if content_hash in taken:
+                requests.append(DeleteOne({"_id": doc["_id"]}))
+                removed += 1
+            else:
+                taken.add(content_hash)
+                requests.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"hash": content_hash}}))
+                hashed += 1
+        try:
+            await chatai.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            LOGGER.warning(f"Reply hash backfill: {len(e.details.get('writeErrors', []))} writes failed")
+        LOGGER.info(f"Reply hash backfill: {hashed} hashed, {removed} duplicates removed")
+        await asyncio.sleep(0)
+    await migrations.update_one(
+        {"_id": "reply_hash"}, {"$set": {"hashed": hashed, "removed": removed}}, upsert=True
+    )
+
+
+# Newly learned pairs are written in batches off the message path
+reply_writer = WriteBehind("learned replies", insert_replies, REPLY_FLUSH_SIZE, REPLY_FLUSH_INTERVAL)
+
+
+async def add_learned_reply(reply_data: dict):
+    if not replies_loaded.is_set():
+        await load_replies()
+    # The in-memory corpus stands in for the find_one round trip
+    reply = Reply.from_document(reply_data)
+    if replies_cache.add(reply):
+        content_hash = reply_hash(reply)
+        reply_writer.put(content_hash, dict(reply_data, hash=content_hash))
+
+
+async def increment_counts(docs):
+    await chatai.bulk_write(
+        [UpdateOne({"hash": doc["hash"]}, {"$inc": doc["inc"]}) for doc in docs],
+        ordered=False,
+    )
+
+
+def merge_counts(queued: dict, doc: dict):
+    for field, value in doc["inc"].items():
+        queued["inc"][field] = queued["inc"].get(field, 0) + value
+
+
+# Usage counters are kept in memory and added to the stored pairs periodically
+count_writer = WriteBehind(
+    "reply counters", increment_counts, 1000, REPLY_COUNT_INTERVAL, merge=merge_counts
+)
+sent_replies: "OrderedDict[Tuple[int, int], Reply]" = OrderedDict()
+
+
+def _count(reply: Reply, **inc):
+    global count_generation
+    replies_cache.count(reply, **inc)
+    count_generation += 1
+    content_hash = reply_hash(reply)
+    count_writer.put(content_hash, {"hash": content_hash, "inc": inc})
+
+
+def reply_sent(chat_id: int, message_id: int, reply: Reply):
+    """Credit a use to the reply the bot just sent"""
+    _count(reply, uses=1)
+    sent_replies[(chat_id, message_id)] = reply
+    if len(sent_replies) > SENT_REPLIES:
+        sent_replies.popitem(last=False)
+
+
+def reply_answered(chat_id: int, message_id: int):
+    """Credit the reply behind a bot message that someone answered"""
+    reply = sent_replies.pop((chat_id, message_id), None)
+    if reply is not None:
+        _count(reply, replied=1)
+
+
+async def flush_replies():
+    """Write queued pairs and counters now, e.g. before shutdown"""
+    await reply_writer.close()
+    await count_writer.close()
+
+
+def _merge(doc: dict) -> bool:
+    """Add a pair stored by any process, unless it hits words blocked since it was learned"""
+    reply = Reply.from_document(doc)
+    if abuse_filter.version is not None and _offends(abuse_filter.matcher, reply):
+        return False
+    return replies_cache.add(reply)
+
+
+async def sync_replies() -> int:
+    """Merge pairs stored after the cursor, a page at a time until caught up
+
+    Serialized, so the change stream only advances the cursor once the
+    sync it runs on connecting has read everything before it.
+    """
+    added = 0
+    async with sync_lock:
+        while high_water is not None:
+            docs = await (
+                chatai.find({"_id": {"$gt": high_water}}, REPLY_FIELDS)
+                .sort("_id", 1)
+                .limit(SYNC_BATCH)
+                .to_list(length=SYNC_BATCH)
+            )
+            for doc in docs:
+                added += _merge(doc)
+                _advance(doc["_id"])
+            if len(docs) < SYNC_BATCH:
+                break
+    return added
+
+
+async def watch_replies():
+    """Follow new pairs through a change stream, or poll when the server has none"""
+    await load_replies()
+    while True:
+        try:
+            async with chatai.watch([{"$match": {"operationType": "insert"}}]) as stream:
+                await sync_replies()
+                async for change in stream:
+                    doc = change["fullDocument"]
+                    _merge(doc)
+                    _advance(doc["_id"])
+        except OperationFailure as e:
+            LOGGER.info(f"Reply change stream unavailable ({e}), polling every {REPLY_SYNC_INTERVAL}s")
+            break
+        except Exception as e:
+            LOGGER.warning(f"Reply change stream interrupted: {e}")
+            await asyncio.sleep(REPLY_SYNC_INTERVAL)
+
+    while True:
+        await asyncio.sleep(REPLY_SYNC_INTERVAL)
+        try:
+            added = await sync_replies()
+            if added:
+                LOGGER.info(f"Synced {added} new replies")
+        except Exception as e:
+            LOGGER.error(f"Error syncing replies: {e}")
+
+
+async def refresh_snapshot():
+    while True:
+        await asyncio.sleep(REPLY_SNAPSHOT_INTERVAL)
+        await save_snapshot()
+
+
+async def migrate_replies():
+    try:
+        await backfill_reply_hashes()
+    except Exception as e:
+        LOGGER.error(f"Error backfilling reply hashes: {e}")
+
+
+def _offends(matcher: AbuseMatcher, reply: Reply, cached: bool = True) -> bool:
+    if reply.word and matcher.search(reply.word, cached):
+        return True
+    return reply.media == MediaType.TEXT and bool(reply.text) and matcher.search(reply.text, cached)
+
+
+def _find_offenders(matcher: AbuseMatcher, replies: List[Reply]) -> List[Reply]:
+    return [reply for reply in replies if reply.pos >= 0 and _offends(matcher, reply, cached=False)]
+
+
+async def _report_purge(scanned: int, deleted: int, done: bool):
+    for watcher in list(purge_watchers):
+        try:
+            await watcher(scanned, deleted, done)
+        except Exception as e:
+            LOGGER.warning(f"Purge progress report failed: {e}")
+    if done:
+        purge_watchers.clear()
+
+
+async def purge_replies():
+    """Delete stored pairs that hit the purge job's words, one batch at a time
+
+    The job document keeps the words, the last _id scanned and the totals,
+    so an interrupted scan resumes where it stopped.
+    """
+    await replies_loaded.wait()
+    # Pairs still queued for insert are scanned with the rest
+    await reply_writer.flush()
+    loop = asyncio.get_running_loop()
+    matcher = None
+    generation = None
+    reported = 0.0
+    while True:
+        job = await jobs.find_one({"_id": PURGE_JOB})
+        if job is None or job.get("done"):
+            return
+        if job["generation"] != generation:
+            generation = job["generation"]
+            matcher = AbuseMatcher((word, mode) for word, mode in job["words"])
+            LOGGER.info(f"Purging learned replies for {len(matcher)} patterns")
+        query = {"_id": {"$gt": job["cursor"]}} if job.get("cursor") is not None else {}
+        docs = await (
+            chatai.find(query, REPLY_FIELDS)
+            .sort("_id", 1)
+            .limit(PURGE_BATCH)
+            .to_list(length=PURGE_BATCH)
+        )
+        offenders = [doc for doc in docs if _offends(matcher, Reply.from_document(doc))]
+        if offenders:
+            await chatai.delete_many({"_id": {"$in": [doc["_id"] for doc in offenders]}})
+            for doc in offenders:
+                replies_cache.remove(Reply.from_document(doc))
+        scanned = job["scanned"] + len(docs)
+        deleted = job["deleted"] + len(offenders)
+        done = len(docs) < PURGE_BATCH
+        if done and deleted:
+            # A snapshot written before the purge would bring the pairs back
+            await save_snapshot(force=True)
+        update = {"$inc": {"scanned": len(docs), "deleted": len(offenders)}, "$set": {"done": done}}
+        if docs:
+            update["$set"]["cursor"] = docs[-1]["_id"]
+        # Only if start_purge did not reset the job meanwhile
+        await jobs.update_one({"_id": PURGE_JOB, "generation": generation}, update)
+        if done:
+            LOGGER.info(f"Reply purge finished: {scanned} scanned, {deleted} removed")
+        if done or loop.time() - reported >= PURGE_PROGRESS_INTERVAL:
+            reported = loop.time()
+            await _report_purge(scanned, deleted, done)
+        await asyncio.sleep(0)
+
+
+async def evict_blocked():
+    """Drop cached pairs the abuse filter matches, again after every change to the words
+
+    The purge deletes stored pairs once, from the process that ran
+    /block; every process evicts them from its own corpus and snapshot
+    here, including one restarted from a snapshot older than the words.
+    """
+    global corpus_filtered
+    await replies_loaded.wait()
+    loop = asyncio.get_running_loop()
+    # Skipped at boot when the snapshot was checked against the current words
+    while corpus_filtered != abuse_filter.version:
+        version = abuse_filter.version
+        # Off the event loop; pairs learned meanwhile passed is_abuse_present already
+        offenders = await loop.run_in_executor(
+            None, _find_offenders, abuse_filter.matcher, list(replies_cache.pool)
+        )
+        for reply in offenders:
+            replies_cache.remove(reply)
+        corpus_filtered = version
+        if offenders:
+            LOGGER.info(f"Evicted {len(offenders)} cached replies hitting blocked words")
+            await save_snapshot(force=True)
+
+
+async def run_eviction():
+    try:
+        await evict_blocked()
+    except Exception as e:
+        LOGGER.error(f"Error evicting blocked replies: {e}")
+
+
+def _ensure_eviction():
+    # A running pass re-checks the version when it ends, so one task is enough
+    global evict_task
+    if evict_task is None or evict_task.done():
+        evict_task = asyncio.get_event_loop().create_task(run_eviction())
+
+
+abuse_watchers.append(_ensure_eviction)
+
+
+async def run_purge(after: Optional[asyncio.Task] = None):
+    if after is not None:
+        await asyncio.wait({after})
+    try:
+        await purge_replies()
+    except Exception as e:
+        LOGGER.error(f"Error purging replies: {e}")
+
+
+def _ensure_purge():
+    global purge_task
+    loop = asyncio.get_event_loop()
+    if purge_task is None or purge_task.done():
+        purge_task = loop.create_task(run_purge())
+    else:
+        # The running scan may have read the job just before start_purge
+        # reset it; one more pass after it re-reads the job and returns at
+        # once if the scan picked the new words up.
+        purge_task = loop.create_task(run_purge(after=purge_task))
+
+
+async def start_purge(words: List[Tuple[str, Optional[str]]], progress=None):
+    """Remove stored pairs matching newly blocked (word, mode) entries
+
+    Words added while a scan runs restart it from the beginning with the
+    combined list. progress is awaited with (scanned, deleted, done).
+    """
+    words = [[word, mode] for word, mode in words]
+    job = await jobs.find_one({"_id": PURGE_JOB})
+    if job is None or job.get("done"):
+        await jobs.replace_one(
+            {"_id": PURGE_JOB},
+            {
+                "words": words,
+                "cursor": None,
+                "scanned": 0,
+                "deleted": 0,
+                "done": False,
+                "generation": (job or {}).get("generation", 0) + 1,
+            },
+            upsert=True,
+        )
+    else:
+        await jobs.update_one(
+            {"_id": PURGE_JOB},
+            {
+                "$addToSet": {"words": {"$each": words}},
+                # done too: the scan may have finished since the job was read
+                "$set": {"cursor": None, "scanned": 0, "done": False},
+                "$inc": {"generation": 1},
+            },
+        )
+    if progress is not None:
+        purge_watchers.append(progress)
+    _ensure_purge()
+
+
+def start_reply_sync():
+    global sync_task, snapshot_task, migration_task
+    loop = asyncio.get_event_loop()
+    if migration_task is None:
+        migration_task = loop.create_task(migrate_replies())
+    # Resumes a purge interrupted by a restart; returns at once otherwise
+    _ensure_purge()
+    if sync_task is None or sync_task.done():
+        sync_task = loop.create_task(watch_replies())
+    if REPLY_SNAPSHOT and (snapshot_task is None or snapshot_task.done()):
+        snapshot_task = loop.create_task(refresh_snapshot())
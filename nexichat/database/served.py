@@ -0,0 +1,199 @@
+import asyncio
+from array import array
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from config import SERVED_FLUSH_INTERVAL, SERVED_FLUSH_SIZE
+from nexichat import LOGGER, db
+from nexichat.database.indexes import DUPLICATE_KEY, build_index, register_index
+from nexichat.utils.idset import IdSet
+from nexichat.utils.writebehind import WriteBehind
+
+DEDUPE_BATCH = 1000
+
+# {"_id": "<collection>[:<scope values>]:<field><sign>0", "count": n}, one per tracker, for /stats
+served_counts = db.served_counts
+
+
+class ServedIds:
+    """Ids stored in one collection, known in memory so a repeat add costs no round trip
+
+    load() reads the stored ids once in the background and puts a unique
+    index on field, first dropping duplicates the old find-then-insert
+    could leave. New ids are upserted in batches; one added before the
+    load finished may be upserted again, which changes nothing. With
+    scope, the ids are those of the documents matching it in a shared
+    collection, and the unique index covers the scope fields too.
+
+    Only ids of the tracker's sign are kept: user ids are positive, chat
+    ids negative. The chatbot handlers pass group ids as users too, and
+    those are ignored rather than stored.
+
+    A counter document follows the number of stored ids: batches $inc it
+    by the upserts that inserted, removals by what they deleted, and each
+    load raises it to at least the ids it read.
+    """
+
+    def __init__(self, name: str, collection, field: str, scope: Optional[Dict[str, Any]] = None,
+                 positive: bool = True):
+        self.name = name
+        self.collection = collection
+        self.field = field
+        self.scope = scope or {}
+        self.positive = positive
+        self.keys = [*self.scope, field]
+        self.query = {**self.scope, field: {"$gt": 0} if positive else {"$lt": 0}}
+        sign = f"{field}>0" if positive else f"{field}<0"
+        self.counter = ":".join([collection.name, *(str(value) for value in self.scope.values()), sign])
+        self.seen = IdSet()
+        self.loaded = False
+        self.hits = 0
+        self.writer = WriteBehind(name, self.save, SERVED_FLUSH_SIZE, SERVED_FLUSH_INTERVAL)
+        self._task: Optional[asyncio.Task] = None
+        # Trackers sharing a collection share the declaration, so it is built once
+        self.index = register_index(collection, self.keys, unique=True, on_duplicates=self.remove_duplicates)
+        served_trackers.append(self)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self.load())
+
+    async def load(self):
+        try:
+            await self.ensure_index()
+        except Exception as e:
+            # Upserts still work without it, only concurrent ones may race
+            LOGGER.warning(f"No unique index for {self.name}: {e}")
+        try:
+            ids = array("q")
+            async for doc in self.collection.find(self.query, {self.field: 1, "_id": 0}):
+                value = doc.get(self.field)
+                if self.accepts(value):
+                    ids.append(value)
+            # Seeds the counter, and repairs it if an increment was ever lost
+            await served_counts.update_one({"_id": self.counter}, {"$max": {"count": len(ids)}}, upsert=True)
+            seen = IdSet(ids)
+            # Ids added while the collection was being read
+            seen.update(self.seen)
+            self.seen = seen
+            self.loaded = True
+            LOGGER.info(f"Loaded {len(seen)} {self.name}")
+        except Exception as e:
+            # Left unloaded: every new id is still upserted, known ones just cost a write
+            LOGGER.error(f"Error loading {self.name}: {e}")
+
+    async def ensure_index(self):
+        await build_index(self.index)
+
+    async def remove_duplicates(self) -> int:
+        """Drop all but one document per index key, across every scope of the collection"""
+        extra: List = []
+        pipeline = [
+            {"$group": {
+                "_id": {key: f"${key}" for key in self.keys},
+                "docs": {"$push": "$_id"},
+                "count": {"$sum": 1},
+            }},
+            {"$match": {"count": {"$gt": 1}}},
+        ]
+        async for group in self.collection.aggregate(pipeline, allowDiskUse=True):
+            extra.extend(group["docs"][1:])
+        for i in range(0, len(extra), DEDUPE_BATCH):
+            await self.collection.delete_many({"_id": {"$in": extra[i:i + DEDUPE_BATCH]}})
+        return len(extra)
+
+    async def save(self, docs: List[dict]) -> int:
+        """Upsert documents holding the scope and field, returns how many were not saved"""
+        requests = [
+            UpdateOne({**self.scope, self.field: doc[self.field]}, {"$setOnInsert": doc}, upsert=True)
+            for doc in docs
+        ]
+        errors = []
+        try:
+            result = await self.collection.bulk_write(requests, ordered=False)
+            inserted = result.upserted_count
+        except BulkWriteError as e:
+            inserted = e.details.get("nUpserted", 0)
+            # Another process upserting the same id loses the race on the unique index
+            errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY]
+            if errors:
+                LOGGER.warning(f"{len(errors)} of {len(docs)} {self.name} not saved: {errors[0].get('errmsg')}")
+        await self.bump(inserted)
+        return len(errors)
+
+    async def bump(self, delta: int):
+        # Not upserted: until a load seeds the counter, count() falls back to the collection
+        if delta:
+            try:
+                await served_counts.update_one({"_id": self.counter}, {"$inc": {"count": delta}})
+            except Exception as e:
+                LOGGER.warning(f"Error counting {self.name}: {e}")
+
+    async def count(self) -> int:
+        """Number of stored ids, one document read whatever the size of the collection"""
+        await self.flush()
+        doc = await served_counts.find_one({"_id": self.counter})
+        if doc is not None:
+            return doc["count"]
+        # The load seeds the counter for the next call; until then the
+        # count is covered by the unique index on the scope fields and field
+        self.start()
+        return await self.collection.count_documents(self.query)
+
+    def accepts(self, value) -> bool:
+        return isinstance(value, int) and (value > 0 if self.positive else value < 0)
+
+    def add(self, value: int):
+        """Record an id, written with the next batch unless already known or of the wrong sign"""
+        if not self.accepts(value):
+            return
+        self.start()
+        if not self.seen.add(value):
+            self.hits += 1
+            return
+        self.writer.put(value, {**self.scope, self.field: value})
+
+    async def contains(self, value: int) -> bool:
+        if not self.accepts(value):
+            return False
+        if value in self.seen:
+            return True
+        if self.loaded:
+            return False
+        return await self.collection.find_one({**self.scope, self.field: value}) is not None
+
+    async def remove(self, value: int):
+        self.seen.discard(value)
+        self.writer.pending.pop(value, None)
+        result = await self.collection.delete_many({**self.scope, self.field: value})
+        if self.accepts(value):
+            await self.bump(-result.deleted_count)
+
+    async def flush(self):
+        await self.writer.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.seen),
+            "bytes": self.seen.nbytes,
+            "hits": self.hits,
+            "pending": len(self.writer),
+            "saved": self.writer.flushed,
+        }
+
+
+served_trackers: List[ServedIds] = []
+
+
+def start_served_sync():
+    """Warm the main bot's user and chat ids, clones warm theirs on first use"""
+    for tracker in served_trackers:
+        tracker.start()
+
+
+async def flush_served():
+    """Write queued ids now, e.g. before shutdown"""
+    for tracker in served_trackers:
+        await tracker.writer.close()
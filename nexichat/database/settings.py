@@ -0,0 +1,68 @@
+from typing import Optional
+
+from config import SETTINGS_CACHE_TTL, SETTINGS_NEGATIVE_TTL
+from nexichat import db
+from nexichat.database.indexes import register_index
+from nexichat.utils.ttlcache import MISSING, TTLCache
+
+lang_db = db.ChatLangDb.LangCollection
+status_db = db.chatbot_status_db.status
+# Marked by /start in every tree, looked up by chat_id
+started_db = db.ChatBotStatusDb.StatusCollection
+
+register_index(lang_db, ["chat_id", "bot_id"])
+register_index(status_db, ["chat_id", "bot_id"])
+register_index(started_db, "chat_id")
+
+# Per-chat settings read on every message, shared by all plugin trees and clients.
+# Keys are (field, chat_id, bot_id); bot_id is None for the main bot.
+settings_cache = TTLCache(SETTINGS_CACHE_TTL, SETTINGS_NEGATIVE_TTL)
+# Bumped by every write, so a read that raced one does not cache what it saw
+settings_writes = 0
+
+
+def _scope(chat_id: int, bot_id: Optional[int]) -> dict:
+    # None also matches documents without bot_id, which the main bot writes
+    return {"chat_id": chat_id, "bot_id": bot_id}
+
+
+async def _get(collection, field: str, chat_id: int, bot_id: Optional[int]) -> Optional[str]:
+    key = (field, chat_id, bot_id)
+    value = settings_cache.get(key)
+    if value is MISSING:
+        writes = settings_writes
+        doc = await collection.find_one(_scope(chat_id, bot_id))
+        value = doc.get(field) if doc else None
+        if writes == settings_writes:
+            settings_cache.put(key, value)
+    return value
+
+
+async def _set(collection, field: str, chat_id: int, bot_id: Optional[int], value: str):
+    global settings_writes
+    key = (field, chat_id, bot_id)
+    settings_writes += 1
+    settings_cache.invalidate(key)
+    await collection.update_one(_scope(chat_id, bot_id), {"$set": {field: value}}, upsert=True)
+    settings_cache.put(key, value)
+
+
+async def get_chat_language(chat_id: int, bot_id: Optional[int] = None) -> Optional[str]:
+    return await _get(lang_db, "language", chat_id, bot_id)
+
+
+async def set_chat_language(chat_id: int, language: str, bot_id: Optional[int] = None):
+    await _set(lang_db, "language", chat_id, bot_id, language)
+
+
+async def get_chat_status(chat_id: int, bot_id: Optional[int] = None) -> Optional[str]:
+    """"enabled", "disabled", or None if never set"""
+    return await _get(status_db, "status", chat_id, bot_id)
+
+
+async def set_chat_status(chat_id: int, status: str, bot_id: Optional[int] = None):
+    await _set(status_db, "status", chat_id, bot_id, status)
+
+
+async def is_chatbot_enabled(chat_id: int, bot_id: Optional[int] = None) -> bool:
+    return await get_chat_status(chat_id, bot_id) != "disabled"
@@ -1,6 +1,9 @@
+import os
 import random
 from motor.motor_asyncio import AsyncIOMotorClient as MongoCli
 
+from config import REPLY_SNAPSHOT
+
 CHAT_STORAGE = [
     "mongodb+srv://chatbot1:a@cluster0.pxbu0.mongodb.net/?retryWrites=true&w=majority&appName=Cluster0",
     "mongodb+srv://chatbot2:b@cluster0.9i8as.mongodb.net/?retryWrites=true&w=majority&appName=Cluster0",
@@ -14,7 +17,38 @@ CHAT_STORAGE = [
     "mongodb+srv://chatbot10:j@cluster0.9esnn.mongodb.net/?retryWrites=true&w=majority&appName=Cluster0",
 ]
 
-VIPBOY = MongoCli(random.choice(CHAT_STORAGE))
+# Which CHAT_STORAGE entry this deployment uses, next to the reply snapshot
+# taken from it; delete the file to pick another cluster
+CHAT_STORAGE_CHOICE = f"{REPLY_SNAPSHOT}.cluster" if REPLY_SNAPSHOT else None
+
+
+def pick_chat_storage() -> str:
+    """A random cluster on the first start, the same one on later starts"""
+    if CHAT_STORAGE_CHOICE:
+        try:
+            with open(CHAT_STORAGE_CHOICE) as f:
+                index = int(f.read())
+            if 0 <= index < len(CHAT_STORAGE):
+                return CHAT_STORAGE[index]
+        except (OSError, ValueError):
+            pass
+    index = random.randrange(len(CHAT_STORAGE))
+    if CHAT_STORAGE_CHOICE:
+        try:
+            directory = os.path.dirname(CHAT_STORAGE_CHOICE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(CHAT_STORAGE_CHOICE, "w") as f:
+                f.write(str(index))
+        except OSError:
+            pass
+    return CHAT_STORAGE[index]
+
+
+CHAT_STORAGE_URL = pick_chat_storage()
+VIPBOY = MongoCli(CHAT_STORAGE_URL)
 chatdb = VIPBOY.Anonymous
 chatai = chatdb.Word.WordDb
+migrations = chatdb.Word.Migrations
+jobs = chatdb.Word.Jobs
 storeai = VIPBOY.Anonymous.Word.NewWordDb  
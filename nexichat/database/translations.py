@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import time
+from datetime import datetime
+from collections import Counter
+from typing import Dict, Optional
+
+from pymongo import UpdateOne
+
+from config import (
+    TRANSLATION_BACKEND,
+    TRANSLATION_BATCH_WINDOW,
+    TRANSLATION_BREAKER_FAILURES,
+    TRANSLATION_BREAKER_RESET,
+    TRANSLATION_CACHE_BYTES,
+    TRANSLATION_CACHE_TTL,
+    TRANSLATION_LOCAL_LATENCY,
+    TRANSLATION_TIMEOUT,
+    TRANSLATION_WARM_INTERVAL,
+    TRANSLATION_WARM_LANGS,
+    TRANSLATION_WARM_RATE,
+    TRANSLATION_WARM_REPLIES,
+    TRANSLATION_WORKERS,
+)
+from nexichat import LOGGER, db
+from nexichat.database.indexes import build_index, register_index
+from nexichat.utils.circuit import CLOSED, CircuitBreaker
+from nexichat.utils.lrucache import ByteLRU
+from nexichat.utils.translation import BatchQueue, make_backend
+from nexichat.utils.writebehind import WriteBehind
+
+# {"_id": "<lang>:<text hash>", "text": translation, "created": datetime}, expired by a TTL index
+translations_db = db.TranslationDb.cache
+translation_index = register_index(translations_db, "created", expireAfterSeconds=int(TRANSLATION_CACHE_TTL * 86400))
+
+# Recent translations in memory, the collection behind them shared by all processes
+translation_cache = ByteLRU(TRANSLATION_CACHE_BYTES)
+
+translation_backend = make_backend(
+    TRANSLATION_BACKEND, workers=TRANSLATION_WORKERS, latency=TRANSLATION_LOCAL_LATENCY
+)
+translation_breaker = CircuitBreaker(TRANSLATION_BREAKER_FAILURES, TRANSLATION_BREAKER_RESET)
+# Misses for the same language within a few ms share one backend call, which
+# counts once towards the breaker
+translation_batches = BatchQueue(
+    translation_backend, TRANSLATION_BATCH_WINDOW, translation_breaker, TRANSLATION_TIMEOUT
+)
+# Translations in flight, awaited by identical requests instead of repeated
+translation_inflight: Dict[str, asyncio.Future] = {}
+
+# How often each reply text and chat language was asked for, decayed by the warmer
+# and only counted while it runs
+hot_replies: Counter = Counter()
+hot_langs: Counter = Counter()
+HOT_TRACKED = 10_000
+warm_task: Optional[asyncio.Task] = None
+# Set once save_translations has tried the TTL index
+translation_index_tried = False
+
+# Counters for /cachestats
+translation_metrics = {
+    "db_hits": 0,
+    "translated": 0,
+    "failed": 0,
+    "timeouts": 0,
+    "coalesced": 0,
+    "skipped": 0,
+    "translate_time": 0.0,
+    "db_hit_time": 0.0,
+}
+
+
+def translation_key(text: str, lang: str) -> str:
+    return f"{lang}:{hashlib.blake2b(text.encode(), digest_size=16).hexdigest()}"
+
+
+async def save_translations(docs):
+    global translation_index_tried
+    if not translation_index_tried:
+        translation_index_tried = True
+        try:
+            await build_index(translation_index)
+        except Exception as e:
+            # e.g. a TTL changed since the index was built; cached translations then expire at the old one
+            LOGGER.warning(f"No TTL index for translations: {e}")
+    await translations_db.bulk_write(
+        [UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True) for doc in docs], ordered=False
+    )
+
+
+# Translations are written off the message path, a batch every few seconds
+translation_writer = WriteBehind("translations", save_translations, 200, 10.0)
+
+
+async def flush_translations():
+    """Write queued translations now, e.g. before shutdown"""
+    await translation_writer.close()
+
+
+async def _fetch(key: str, text: str, lang: str) -> str:
+    """Translate through the backend, the reply itself when it is down, slow or failing"""
+    if translation_backend.busy or not translation_breaker.allow():
+        translation_metrics["skipped"] += 1
+        return text
+    start = time.perf_counter()
+    try:
+        # The queue times the backend call out and reports it to the breaker
+        translated = await translation_batches.translate(text, lang)
+    except asyncio.TimeoutError:
+        translation_metrics["timeouts"] += 1
+        LOGGER.warning(f"Translation to {lang} timed out after {TRANSLATION_TIMEOUT}s")
+        return text
+    except Exception as e:
+        translation_metrics["failed"] += 1
+        LOGGER.warning(f"Translation to {lang} failed: {e}")
+        return text
+    translation_metrics["translated"] += 1
+    translation_metrics["translate_time"] += time.perf_counter() - start
+    if not translated:
+        return text
+    translation_cache.put(key, translated)
+    translation_writer.put(key, {"_id": key, "text": translated, "created": datetime.utcnow()})
+    return translated
+
+
+async def _lookup(key: str, text: str, lang: str, warm: bool = False) -> str:
+    start = time.perf_counter()
+    try:
+        doc = await translations_db.find_one({"_id": key})
+    except Exception as e:
+        # A cache, not the source: without it the reply is translated or sent as is
+        LOGGER.warning(f"Translation cache lookup failed: {e}")
+        doc = None
+    if doc is not None:
+        # Warm lookups are not requests, so they stay out of the hit ratio
+        if not warm:
+            translation_metrics["db_hits"] += 1
+            translation_metrics["db_hit_time"] += time.perf_counter() - start
+        translation_cache.put(key, doc["text"])
+        return doc["text"]
+    return await _fetch(key, text, lang)
+
+
+async def _shared(key: str, text: str, lang: str, warm: bool = False) -> str:
+    """Look a translation up once for every concurrent request of it"""
+    inflight = translation_inflight.get(key)
+    if inflight is not None:
+        if not warm:
+            translation_metrics["coalesced"] += 1
+        return await asyncio.shield(inflight)
+    task = translation_inflight[key] = asyncio.ensure_future(_lookup(key, text, lang, warm))
+    task.add_done_callback(lambda _: translation_inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def translate_reply(text: str, lang: str) -> str:
+    """Translate a learned reply into a chat's language, the reply itself if that fails"""
+    if TRANSLATION_WARM_RATE > 0:
+        hot_replies[text] += 1
+        hot_langs[lang] += 1
+    key = translation_key(text, lang)
+    cached = translation_cache.get(key)
+    if cached is not None:
+        return cached
+    return await _shared(key, text, lang)
+
+
+def _decay(counter: Counter, keep: int):
+    """Halve the counts so the ranking follows recent traffic, keeping the top entries"""
+    top = counter.most_common(keep)
+    counter.clear()
+    counter.update({item: count // 2 for item, count in top if count > 1})
+
+
+async def warm_translations() -> int:
+    """Translate the hottest replies into the busiest languages ahead of time
+
+    Walks the top TRANSLATION_WARM_REPLIES replies for each of the top
+    TRANSLATION_WARM_LANGS languages, hottest replies first, spending at most
+    TRANSLATION_WARM_RATE lookups per second on pairs not in memory.
+    """
+    langs = [lang for lang, _ in hot_langs.most_common(TRANSLATION_WARM_LANGS)]
+    texts = [text for text, _ in hot_replies.most_common(TRANSLATION_WARM_REPLIES)]
+    _decay(hot_replies, HOT_TRACKED)
+    _decay(hot_langs, HOT_TRACKED)
+    warmed = 0
+    for text in texts:
+        for lang in langs:
+            key = translation_key(text, lang)
+            if key in translation_cache:
+                continue
+            if translation_breaker.state != CLOSED:
+                return warmed
+            await _shared(key, text, lang, warm=True)
+            warmed += 1
+            await asyncio.sleep(1 / TRANSLATION_WARM_RATE)
+    return warmed
+
+
+async def run_translation_warmer():
+    while True:
+        await asyncio.sleep(TRANSLATION_WARM_INTERVAL)
+        try:
+            warmed = await warm_translations()
+            if warmed:
+                LOGGER.info(f"Pre-translated {warmed} hot replies")
+        except Exception as e:
+            LOGGER.error(f"Error pre-translating replies: {e}")
+
+
+def start_translation_warmer():
+    global warm_task
+    if TRANSLATION_WARM_RATE > 0 and (warm_task is None or warm_task.done()):
+        warm_task = asyncio.get_event_loop().create_task(run_translation_warmer())
+
+
+def translation_stats() -> dict:
+    """Hit ratios and the translation time the cache saved, in seconds"""
+    memory = translation_cache.stats()
+    metrics = translation_metrics
+    lookups = memory["hits"] + memory["misses"]
+    hits = memory["hits"] + metrics["db_hits"]
+    avg_translate = metrics["translate_time"] / metrics["translated"] if metrics["translated"] else 0.0
+    return {
+        "memory": memory,
+        "db_hits": metrics["db_hits"],
+        "translated": metrics["translated"],
+        "failed": metrics["failed"],
+        "hit_ratio": hits / lookups if lookups else 0.0,
+        "memory_hit_ratio": memory["hits"] / lookups if lookups else 0.0,
+        "avg_translate": avg_translate,
+        "saved": max(hits * avg_translate - metrics["db_hit_time"], 0.0),
+        "timeouts": metrics["timeouts"],
+        "coalesced": metrics["coalesced"],
+        "skipped": metrics["skipped"],
+        "breaker": translation_breaker.state,
+        "breaker_opens": translation_breaker.opens,
+        "backend": translation_backend.name,
+        "backend_calls": translation_batches.calls,
+        "batched": translation_batches.texts,
+        "running": translation_backend.running,
+    }
@@ -1,24 +1,25 @@
 from nexichat import db
+from nexichat.database.served import ServedIds
 
 usersdb = db.users
+served_users = ServedIds("served users", usersdb, "user_id")
 
 
 async def is_served_user(user_id: int) -> bool:
-    user = await usersdb.find_one({"user_id": user_id})
-    if not user:
-        return False
-    return True
+    return await served_users.contains(user_id)
 
 
 async def get_served_users() -> list:
+    await served_users.flush()
     users_list = []
     async for user in usersdb.find({"user_id": {"$gt": 0}}):
         users_list.append(user)
     return users_list
 
 
+async def get_served_users_count() -> int:
+    return await served_users.count()
+
+
 async def add_served_user(user_id: int):
-    is_served = await is_served_user(user_id)
-    if is_served:
-        return
-    return await usersdb.insert_one({"user_id": user_id})
+    served_users.add(user_id)
@@ -7,32 +7,21 @@ from pyrogram import Client, filters
 from pyrogram.errors import MessageEmpty
 from pyrogram.enums import ChatAction, ChatMemberStatus as CMS
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, CallbackQuery
-from deep_translator import GoogleTranslator
 from nexichat.database.chats import add_served_chat
 from nexichat.database.users import add_served_user
+from nexichat.database.settings import get_chat_status, set_chat_language, set_chat_status
 from config import MONGO_URL
-from nexichat import nexichat, mongo, LOGGER, db
+from nexichat import nexichat, mongo, LOGGER
 from nexichat.idchatbot.helpers import languages
 import asyncio
 
-translator = GoogleTranslator()
 
-lang_db = db.ChatLangDb.LangCollection
-status_db = db.chatbot_status_db.status
-
-
-async def get_chat_language(chat_id, bot_id):
-    chat_lang = await lang_db.find_one({"chat_id": chat_id, "bot_id": bot_id})
-    return chat_lang["language"] if chat_lang and "language" in chat_lang else None
-   
-    
 @Client.on_message(filters.command("status", prefixes=[".", "/"]))
 async def status_command(client: Client, message: Message):
     chat_id = message.chat.id
     bot_id = client.me.id
-    chat_status = await status_db.find_one({"chat_id": chat_id, "bot_id": bot_id})
-    if chat_status:
-        current_status = chat_status.get("status", "not found")
+    current_status = await get_chat_status(chat_id, bot_id)
+    if current_status:
         await message.reply(f"Chatbot status for this chat: **{current_status}**")
     else:
         await message.reply("No status found for this chat.")
@@ -41,11 +30,7 @@ async def status_command(client: Client, message: Message):
 async def reset_language(client: Client, message: Message):
     chat_id = message.chat.id
     bot_id = client.me.id
-    lang_db.update_one(
-        {"chat_id": chat_id, "bot_id": bot_id},
-        {"$set": {"language": "nolang"}},
-        upsert=True
-    )
+    await set_chat_language(chat_id, "nolang", bot_id)
     await message.reply_text("**Bot language has been reset in this chat to mix language.**")
 
 
@@ -58,18 +43,10 @@ async def chatbot_command(client: Client, message: Message):
         bot_id = client.me.id
 
         if flag in ["on", "enable"]:
-            status_db.update_one(
-                {"chat_id": chat_id, "bot_id": bot_id},
-                {"$set": {"status": "enabled"}},
-                upsert=True
-            )
+            await set_chat_status(chat_id, "enabled", bot_id)
             await message.reply_text(f"Chatbot has been **enabled** for this chat ✅.")
         elif flag in ["off", "disable"]:
-            status_db.update_one(
-                {"chat_id": chat_id, "bot_id": bot_id},
-                {"$set": {"status": "disabled"}},
-                upsert=True
-            )
+            await set_chat_status(chat_id, "disabled", bot_id)
             await message.reply_text(f"Chatbot has been **disabled** for this chat ❌.")
         else:
             await message.reply_text("Invalid option! Use `/chatbot on` or `/chatbot off`.")
@@ -88,11 +65,7 @@ async def set_language(client: Client, message: Message):
         lang_code = command[1]
         chat_id = message.chat.id
         bot_id = client.me.id
-        lang_db.update_one(
-            {"chat_id": chat_id, "bot_id": bot_id},
-            {"$set": {"language": lang_code}},
-            upsert=True
-        )
+        await set_chat_language(chat_id, lang_code, bot_id)
         await message.reply_text(f"Language has been set to `{lang_code}`.")
     else:
         await message.reply_text(
@@ -4,53 +4,47 @@ from pyrogram import Client, filters
 from pyrogram.errors import MessageEmpty
 from pyrogram.enums import ChatAction, ChatMemberStatus as CMS
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, CallbackQuery
-from deep_translator import GoogleTranslator
 from nexichat.database.chats import add_served_chat
 from nexichat.database.users import add_served_user
-from nexichat.database import abuse_list, add_served_cchat, add_served_cuser, chatai
+from nexichat.database import (abuse_filter, add_abuse_word, add_learned_reply, add_served_cchat, add_served_cuser,
+                               get_chat_language, get_learned_reply, is_abuse_present, is_chatbot_enabled,
+                               load_abuse_words, remove_abuse_word, reply_answered, reply_sent,
+                               start_purge, translate_reply)
 from config import MONGO_URL, OWNER_ID
-from nexichat import nexichat, mongo, LOGGER, db
+from nexichat import nexichat, mongo, LOGGER
 from nexichat.idchatbot.helpers import languages
+from nexichat.utils.abuse import MODES, TOKEN_MAX_LEN
 import asyncio
 
-translator = GoogleTranslator()
-
-lang_db = db.ChatLangDb.LangCollection
-status_db = db.chatbot_status_db.status
-abuse_words_db = db.abuse_words_db.words
-
-replies_cache = []
-abuse_cache = []
 blocklist = {}
 message_counts = {}
 
 
-async def load_abuse_cache():
-    global abuse_cache
-    abuse_cache = [entry['word'] for entry in await abuse_words_db.find().to_list(length=None)]
-
-async def add_abuse_word(word: str):
-    global abuse_cache
-    if word not in abuse_cache:
-        await abuse_words_db.insert_one({"word": word})
-        abuse_cache.append(word)
-
-async def is_abuse_present(text: str):
-    global abuse_cache
-    if not abuse_cache:
-        await load_abuse_cache()
-    text_lower = text.lower()
-    return any(word in text_lower for word in abuse_list) or any(word in text_lower for word in abuse_cache)
+def purge_progress(status: Message, header: str):
+    async def progress(scanned: int, deleted: int, done: bool):
+        state = "Done" if done else "Purging"
+        await status.edit_text(f"{header}\n{state}: {scanned} learned replies scanned, {deleted} removed.")
+    return progress
 
 @Client.on_message(filters.command("block") & filters.user(OWNER_ID))
 async def block_word(client: Client, message: Message):
     try:
         if len(message.command) < 2:
-            await message.reply_text("**Usage:** `/block <word>`\nAdd a word to the abuse list.")
+            await message.reply_text(
+                "**Usage:** `/block <word> [token|substring]`\nAdd a word to the abuse list.\n"
+                "`token` matches whole words only, `substring` also inside other words. "
+                f"Default: token up to {TOKEN_MAX_LEN} letters, substring above."
+            )
             return
         new_word = message.command[1].lower()
-        await add_abuse_word(new_word)
-        await message.reply_text(f"**Word '{new_word}' added to abuse list!**")
+        mode = message.command[2].lower() if len(message.command) > 2 else None
+        if mode is not None and mode not in MODES:
+            await message.reply_text(f"**Unknown mode '{mode}', use token or substring.**")
+            return
+        await add_abuse_word(new_word, mode)
+        header = f"**Word '{new_word}' added to abuse list ({abuse_filter.mode(new_word)} match)!**"
+        status = await message.reply_text(f"{header}\nRemoving learned replies that contain it...")
+        await start_purge([(new_word, mode)], purge_progress(status, header))
     except Exception as e:
         await message.reply_text(f"Error: {e}")
 
@@ -61,10 +55,7 @@ async def unblock_word(client: Client, message: Message):
             await message.reply_text("**Usage:** `/unblock <word>`\nRemove a word from the abuse list.")
             return
         word_to_remove = message.command[1].lower()
-        global abuse_cache
-        if word_to_remove in abuse_cache:
-            await abuse_words_db.delete_one({"word": word_to_remove})
-            abuse_cache.remove(word_to_remove)
+        if await remove_abuse_word(word_to_remove):
             await message.reply_text(f"**Word '{word_to_remove}' removed from abuse list!**")
         else:
             await message.reply_text(f"**Word '{word_to_remove}' is not in the abuse list.**")
@@ -74,11 +65,9 @@ async def unblock_word(client: Client, message: Message):
 @Client.on_message(filters.command("blocked") & filters.user(OWNER_ID))
 async def list_blocked_words(client: Client, message: Message):
     try:
-        global abuse_cache
-        if not abuse_cache:
-            await load_abuse_cache()
-        if abuse_cache:
-            blocked_words = ", ".join(abuse_cache)
+        await load_abuse_words()
+        if abuse_filter.words:
+            blocked_words = ", ".join(f"{word} ({abuse_filter.mode(word)})" for word in abuse_filter.words)
             await message.reply_text(f"**Blocked Words:**\n{blocked_words}")
         else:
             await message.reply_text("**No blocked words found.**")
@@ -86,7 +75,6 @@ async def list_blocked_words(client: Client, message: Message):
         await message.reply_text(f"Error: {e}")
 
 async def save_reply(original_message: Message, reply_message: Message):
-    global replies_cache
     try:
         if (original_message.text and await is_abuse_present(original_message.text)) or \
            (reply_message.text and await is_abuse_present(reply_message.text)):
@@ -121,41 +109,20 @@ async def save_reply(original_message: Message, reply_message: Message):
             reply_data["text"] = translated_text
             reply_data["check"] = "none"
 
-        is_chat = await chatai.find_one(reply_data)
-        if not is_chat:
-            await chatai.insert_one(reply_data)
-            replies_cache.append(reply_data)
+        await add_learned_reply(reply_data)
 
     except Exception as e:
         print(f"Error in save_reply: {e}")
 
-async def load_replies_cache():
-    global replies_cache
-    replies_cache = await chatai.find().to_list(length=None)
-    await load_abuse_cache()
-
 async def get_reply(word: str):
-    global replies_cache
-    if not replies_cache:
-        await load_replies_cache()
-        
-    relevant_replies = [reply for reply in replies_cache if reply['word'] == word]
-    if not relevant_replies:
-        relevant_replies = replies_cache
-    return random.choice(relevant_replies) if relevant_replies else None
-
-async def get_chat_language(chat_id, bot_id):
-    chat_lang = await lang_db.find_one({"chat_id": chat_id, "bot_id": bot_id})
-    return chat_lang["language"] if chat_lang and "language" in chat_lang else None
-    
+    return await get_learned_reply(word)
+
 @Client.on_message(filters.incoming)
 async def chatbot_response(client: Client, message: Message):
     try:
         chat_id = message.chat.id
         bot_id = client.me.id
-        chat_status = await status_db.find_one({"chat_id": chat_id, "bot_id": bot_id})
-        
-        if chat_status and chat_status.get("status") == "disabled":
+        if not await is_chatbot_enabled(chat_id, bot_id):
             return
 
         if message.text and any(message.text.startswith(prefix) for prefix in ["!", "/", ".", "?", "@", "#"]):
@@ -164,54 +131,58 @@ async def chatbot_response(client: Client, message: Message):
             else:
                 return await add_served_user(message.chat.id)
 
+        if message.reply_to_message:
+            reply_answered(chat_id, message.reply_to_message.id)
+
         if ((message.reply_to_message and message.reply_to_message.from_user.id == client.me.id) or not message.reply_to_message) and not message.from_user.is_bot:
             reply_data = await get_reply(message.text)
 
             if reply_data:
+                sent = None
                 response_text = reply_data["text"]
                 chat_lang = await get_chat_language(chat_id, bot_id)
 
-                if not chat_lang or chat_lang == "nolang":
+                if not chat_lang or chat_lang == "nolang" or reply_data["check"] != "none":
                     translated_text = response_text
                 else:
-                    translated_text = GoogleTranslator(source='auto', target=chat_lang).translate(response_text)
-                    if not translated_text:
-                        translated_text = response_text
+                    translated_text = await translate_reply(response_text, chat_lang)
                 if reply_data["check"] == "sticker":
                     try:
-                        await message.reply_sticker(reply_data["text"])
+                        sent = await message.reply_sticker(reply_data["text"])
                     except:
                         pass
                 elif reply_data["check"] == "photo":
                     try:
-                        await message.reply_photo(reply_data["text"])
+                        sent = await message.reply_photo(reply_data["text"])
                     except:
                         pass
                 elif reply_data["check"] == "video":
                     try:
-                        await message.reply_video(reply_data["text"])
+                        sent = await message.reply_video(reply_data["text"])
                     except:
                         pass
                 elif reply_data["check"] == "audio":
                     try:
-                        await message.reply_audio(reply_data["text"])
+                        sent = await message.reply_audio(reply_data["text"])
                     except:
                         pass
                 elif reply_data["check"] == "gif":
                     try:
-                        await message.reply_animation(reply_data["text"])
+                        sent = await message.reply_animation(reply_data["text"])
                     except:
                         pass
                 elif reply_data["check"] == "voice":
                     try:
-                        await message.reply_voice(reply_data["text"])
+                        sent = await message.reply_voice(reply_data["text"])
                     except:
                         pass
                 else:
                     try:
-                        await message.reply_text(translated_text)
+                        sent = await message.reply_text(translated_text)
                     except:
                         pass
+                if sent:
+                    reply_sent(chat_id, sent.id, reply_data)
             else:
                 try:
                     await message.reply_text("**I don't understand. What are you saying?**")
@@ -4,16 +4,16 @@ from pyrogram import Client, filters
 from pyrogram.errors import MessageEmpty
 from pyrogram.enums import ChatAction
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
-from deep_translator import GoogleTranslator
 from nexichat.database.chats import add_served_chat
 from nexichat.database.users import add_served_user
+from nexichat.database.settings import set_chat_language, set_chat_status
 from config import MONGO_URL
 from nexichat import nexichat, mongo
 from pyrogram.enums import ChatMemberStatus as CMS
 from pyrogram.types import CallbackQuery
 import asyncio
 import config
-from nexichat import LOGGER, nexichat, db
+from nexichat import LOGGER, nexichat
 from nexichat.modules.helpers import (
     ABOUT_BTN,
     ABOUT_READ,
@@ -32,9 +32,6 @@ from nexichat.modules.helpers import (
 )
 
 
-lang_db = db.ChatLangDb.LangCollection
-status_db = db.chatbot_status_db.status
-
 def generate_language_buttons(languages):
     buttons = []
     current_row = []
@@ -126,7 +123,7 @@ async def cb_handler(client: Client, query: CallbackQuery):
     # Enable chatbot for the chat
     elif query.data == "enable_chatbot":
         chat_id = query.message.chat.id
-        status_db.update_one({"chat_id": chat_id}, {"$set": {"status": "enabled"}}, upsert=True)
+        await set_chat_status(chat_id, "enabled")
         await query.answer("Chatbot enabled ✅", show_alert=True)
         await query.edit_message_text(
             f"Chat: {query.message.chat.title}\n**Chatbot has been enabled.**"
@@ -135,7 +132,7 @@ async def cb_handler(client: Client, query: CallbackQuery):
     # Disable chatbot for the chat
     elif query.data == "disable_chatbot":
         chat_id = query.message.chat.id
-        status_db.update_one({"chat_id": chat_id}, {"$set": {"status": "disabled"}}, upsert=True)
+        await set_chat_status(chat_id, "disabled")
         await query.answer("Chatbot disabled!", show_alert=True)
         await query.edit_message_text(
             f"Chat: {query.message.chat.title}\n**Chatbot has been disabled.**"
@@ -146,7 +143,7 @@ async def cb_handler(client: Client, query: CallbackQuery):
         lang_code = query.data.split("_")[1]
         chat_id = query.message.chat.id
         if lang_code in languages.values():
-            lang_db.update_one({"chat_id": chat_id}, {"$set": {"language": lang_code}}, upsert=True)
+            await set_chat_language(chat_id, lang_code)
             await query.answer(f"Your chat language has been set to {lang_code.title()}.", show_alert=True)
             await query.message.edit_text(f"Chat language has been set to {lang_code.title()}.")
         else:
@@ -155,7 +152,7 @@ async def cb_handler(client: Client, query: CallbackQuery):
     # Reset language selection to mix language
     elif query.data == "nolang":
         chat_id = query.message.chat.id
-        lang_db.update_one({"chat_id": chat_id}, {"$set": {"language": "nolang"}}, upsert=True)
+        await set_chat_language(chat_id, "nolang")
         await query.answer("Bot language has been reset to mix language.", show_alert=True)
         await query.message.edit_text("**Bot language has been reset to mix language.**")
 
@@ -7,11 +7,11 @@ from pyrogram import Client, filters
 from pyrogram.errors import MessageEmpty
 from pyrogram.enums import ChatAction, ChatMemberStatus as CMS
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, CallbackQuery
-from deep_translator import GoogleTranslator
 from nexichat.database.chats import add_served_chat
 from nexichat.database.users import add_served_user
+from nexichat.database.settings import get_chat_status, set_chat_language
 from config import MONGO_URL, OWNER_ID
-from nexichat import nexichat, mongo, LOGGER, db, SUDOERS
+from nexichat import nexichat, mongo, LOGGER, SUDOERS
 from nexichat.modules.helpers import languages, CHATBOT_ON
 from nexichat.modules.helpers import (
     ABOUT_BTN,
@@ -30,11 +30,6 @@ from nexichat.modules.helpers import (
 )
 import asyncio
 
-translator = GoogleTranslator()
-
-lang_db = db.ChatLangDb.LangCollection
-status_db = db.chatbot_status_db.status
-
 
 @nexichat.on_message(
     filters.command(["restart"]) & SUDOERS
@@ -57,10 +52,6 @@ def generate_language_buttons(languages):
         buttons.append(current_row)
     return InlineKeyboardMarkup(buttons)
 
-async def get_chat_language(chat_id):
-    chat_lang = await lang_db.find_one({"chat_id": chat_id})
-    return chat_lang["language"] if chat_lang and "language" in chat_lang else "en"
-    
 @nexichat.on_message(filters.command(["lang", "language", "setlang"]))
 async def set_language(client: Client, message: Message):
     await message.reply_text(
@@ -72,9 +63,8 @@ async def set_language(client: Client, message: Message):
 @nexichat.on_message(filters.command("status"))
 async def status_command(client: Client, message: Message):
     chat_id = message.chat.id
-    chat_status = await status_db.find_one({"chat_id": chat_id})
-    if chat_status:
-        current_status = chat_status.get("status", "not found")
+    current_status = await get_chat_status(chat_id)
+    if current_status:
         await message.reply(f"Chatbot status for this chat: **{current_status}**")
     else:
         await message.reply("No status found for this chat.")
@@ -91,7 +81,7 @@ async def set_language(client: Client, message: Message):
 @nexichat.on_message(filters.command(["resetlang", "nolang"]))
 async def reset_language(client: Client, message: Message):
     chat_id = message.chat.id
-    lang_db.update_one({"chat_id": chat_id}, {"$set": {"language": "nolang"}}, upsert=True)
+    await set_chat_language(chat_id, "nolang")
     await message.reply_text("**Bot language has been reset in this chat to mix language.**")
 
 
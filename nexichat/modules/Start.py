@@ -14,8 +14,8 @@ from pyrogram.enums import ChatType
 from pyrogram import Client, filters
 from config import OWNER_ID, MONGO_URL, OWNER_USERNAME
 from pyrogram.errors import FloodWait, ChatAdminRequired
-from nexichat.database.chats import get_served_chats, add_served_chat
-from nexichat.database.users import get_served_users, add_served_user
+from nexichat.database.chats import get_served_chats, get_served_chats_count, add_served_chat
+from nexichat.database.users import get_served_users, get_served_users_count, add_served_user
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, CallbackQuery
 from nexichat.modules.helpers import (
     START,
@@ -103,8 +103,8 @@ async def welcomejej(client, message: Message):
     chat = message.chat
     await add_served_chat(message.chat.id)
     await set_default_status(message.chat.id)
-    users = len(await get_served_users())
-    chats = len(await get_served_chats())
+    users = await get_served_users_count()
+    chats = await get_served_chats_count()
     try:
         for member in message.new_chat_members:
             
@@ -136,7 +136,7 @@ async def welcomejej(client, message: Message):
                     pass
 
                 count = await nexichat.get_chat_members_count(chat.id)
-                chats = len(await get_served_chats())
+                chats = await get_served_chats_count()
                 username = chat.username if chat.username else "𝐏ʀɪᴠᴀᴛᴇ 𝐆ʀᴏᴜᴘ"
                 msg = (
                     f"**📝𝐌ᴜsɪᴄ 𝐁ᴏᴛ 𝐀ᴅᴅᴇᴅ 𝐈ɴ 𝐀 #𝐍ᴇᴡ_𝐆ʀᴏᴜᴘ**\n\n"
@@ -253,8 +253,8 @@ async def ls(_, m: Message):
 
 @nexichat.on_cmd(["start", "aistart"])
 async def start(_, m: Message):
-    users = len(await get_served_users())
-    chats = len(await get_served_chats())
+    users = await get_served_users_count()
+    chats = await get_served_chats_count()
     if m.chat.type == ChatType.PRIVATE:
         accha = await m.reply_text(
             text=random.choice(EMOJIOS),
@@ -298,8 +298,8 @@ async def start(_, m: Message):
             except AttributeError:
                 chat_photo = BOT  
 
-        users = len(await get_served_users())
-        chats = len(await get_served_chats())
+        users = await get_served_users_count()
+        chats = await get_served_chats_count()
         UP, CPU, RAM, DISK = await bot_sys_stats()
         await m.reply_photo(photo=chat_photo, caption=START.format(nexichat.mention or "can't mention", users, chats, UP), reply_markup=InlineKeyboardMarkup(START_BOT))
         await m.reply_text(f"**{AUTO_MSG}**")
@@ -367,8 +367,8 @@ async def ping(_, message: Message):
 
 @nexichat.on_message(filters.command("stats"))
 async def stats(cli: Client, message: Message):
-    users = len(await get_served_users())
-    chats = len(await get_served_chats())
+    users = await get_served_users_count()
+    chats = await get_served_chats_count()
     await message.reply_text(
         f"""{(await cli.get_me()).mention} ᴄʜᴀᴛʙᴏᴛ sᴛᴀᴛs:
 
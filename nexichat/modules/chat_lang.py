@@ -1,19 +1,15 @@
 from pyrogram import Client, filters
 import requests
 from pyrogram.types import Message
-from nexichat import nexichat as app, mongo, db
+from nexichat import nexichat as app, mongo
+from nexichat.database.settings import get_chat_language
 from MukeshAPI import api
 import asyncio
 from nexichat.modules.helpers import CHATBOT_ON, languages
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, CallbackQuery
 
-lang_db = db.ChatLangDb.LangCollection
 message_cache = {}
 
-async def get_chat_language(chat_id):
-    chat_lang = await lang_db.find_one({"chat_id": chat_id})
-    return chat_lang["language"] if chat_lang and "language" in chat_lang else None
-
 @app.on_message(filters.command("chatlang"))
 async def fetch_chat_lang(client, message):
     chat_id = message.chat.id
@@ -8,12 +8,15 @@ from pyrogram.enums import ChatMemberStatus, ChatType
 from pyrogram.errors import UserNotParticipant
 from pyrogram.enums import ChatAction, ChatMemberStatus as CMS
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, CallbackQuery
-from deep_translator import GoogleTranslator
 from nexichat.database.chats import add_served_chat
 from nexichat.database.users import add_served_user
-from nexichat.database import chatai, abuse_list
+from nexichat.database import (abuse_filter, add_abuse_word, add_learned_reply, get_chat_language,
+                               get_learned_reply, is_abuse_present, is_chatbot_enabled, load_abuse_words,
+                               remove_abuse_word, replies_cache, reply_answered, reply_sent,
+                               reply_writer, settings_cache, start_purge, translate_reply,
+                               translation_stats)
 from config import MONGO_URL, OWNER_ID
-from nexichat import nexichat, mongo, LOGGER, db
+from nexichat import nexichat, mongo, LOGGER
 from nexichat.modules.helpers import CHATBOT_ON, languages
 from nexichat.modules.helpers import (
     ABOUT_BTN,
@@ -30,46 +33,38 @@ from nexichat.modules.helpers import (
     START,
     TOOLS_DATA_READ,
 )
+from nexichat.utils.abuse import MODES, TOKEN_MAX_LEN
 import asyncio
 
-translator = GoogleTranslator()
-
-lang_db = db.ChatLangDb.LangCollection
-status_db = db.chatbot_status_db.status
-abuse_words_db = db.abuse_words_db.words
-
-replies_cache = []
-abuse_cache = []
 blocklist = {}
 message_counts = {}
 
 
-async def load_abuse_cache():
-    global abuse_cache
-    abuse_cache = [entry['word'] for entry in await abuse_words_db.find().to_list(length=None)]
-
-async def add_abuse_word(word: str):
-    global abuse_cache
-    if word not in abuse_cache:
-        await abuse_words_db.insert_one({"word": word})
-        abuse_cache.append(word)
-
-async def is_abuse_present(text: str):
-    global abuse_cache
-    if not abuse_cache:
-        await load_abuse_cache()
-    text_lower = text.lower()
-    return any(word in text_lower for word in abuse_list) or any(word in text_lower for word in abuse_cache)
+def purge_progress(status: Message, header: str):
+    async def progress(scanned: int, deleted: int, done: bool):
+        state = "Done" if done else "Purging"
+        await status.edit_text(f"{header}\n{state}: {scanned} learned replies scanned, {deleted} removed.")
+    return progress
 
 @nexichat.on_message(filters.command("block") & filters.user(OWNER_ID))
 async def block_word(client: Client, message: Message):
     try:
         if len(message.command) < 2:
-            await message.reply_text("**Usage:** `/block <word>`\nAdd a word to the abuse list.")
+            await message.reply_text(
+                "**Usage:** `/block <word> [token|substring]`\nAdd a word to the abuse list.\n"
+                "`token` matches whole words only, `substring` also inside other words. "
+                f"Default: token up to {TOKEN_MAX_LEN} letters, substring above."
+            )
             return
         new_word = message.command[1].lower()
-        await add_abuse_word(new_word)
-        await message.reply_text(f"**Word '{new_word}' added to abuse list!**")
+        mode = message.command[2].lower() if len(message.command) > 2 else None
+        if mode is not None and mode not in MODES:
+            await message.reply_text(f"**Unknown mode '{mode}', use token or substring.**")
+            return
+        await add_abuse_word(new_word, mode)
+        header = f"**Word '{new_word}' added to abuse list ({abuse_filter.mode(new_word)} match)!**"
+        status = await message.reply_text(f"{header}\nRemoving learned replies that contain it...")
+        await start_purge([(new_word, mode)], purge_progress(status, header))
     except Exception as e:
         await message.reply_text(f"Error: {e}")
 
@@ -80,10 +75,7 @@ async def unblock_word(client: Client, message: Message):
             await message.reply_text("**Usage:** `/unblock <word>`\nRemove a word from the abuse list.")
             return
         word_to_remove = message.command[1].lower()
-        global abuse_cache
-        if word_to_remove in abuse_cache:
-            await abuse_words_db.delete_one({"word": word_to_remove})
-            abuse_cache.remove(word_to_remove)
+        if await remove_abuse_word(word_to_remove):
             await message.reply_text(f"**Word '{word_to_remove}' removed from abuse list!**")
         else:
             await message.reply_text(f"**Word '{word_to_remove}' is not in the abuse list.**")
@@ -93,19 +85,53 @@ async def unblock_word(client: Client, message: Message):
 @nexichat.on_message(filters.command("blocked") & filters.user(OWNER_ID))
 async def list_blocked_words(client: Client, message: Message):
     try:
-        global abuse_cache
-        if not abuse_cache:
-            await load_abuse_cache()
-        if abuse_cache:
-            blocked_words = ", ".join(abuse_cache)
+        await load_abuse_words()
+        if abuse_filter.words:
+            blocked_words = ", ".join(f"{word} ({abuse_filter.mode(word)})" for word in abuse_filter.words)
             await message.reply_text(f"**Blocked Words:**\n{blocked_words}")
         else:
             await message.reply_text("**No blocked words found.**")
     except Exception as e:
         await message.reply_text(f"Error: {e}")
 
+@nexichat.on_message(filters.command("cachestats") & filters.user(OWNER_ID))
+async def cache_stats(client: Client, message: Message):
+    try:
+        stats = await asyncio.get_running_loop().run_in_executor(None, replies_cache.stats)
+        writes = reply_writer.stats()
+        translations = translation_stats()
+        settings = settings_cache.stats()
+        await message.reply_text(
+            f"**Reply cache ({replies_cache.strategy}):**\n"
+            f"➻ **Entries:** {stats['entries']}\n"
+            f"➻ **Triggers:** {stats['triggers']}\n"
+            f"➻ **Memory:** {stats['bytes'] / 2**20:.1f} MiB\n"
+            f"➻ **Bytes per entry:** {stats['bytes_per_entry']}\n\n"
+            f"**Pending writes:** {writes['depth']}\n"
+            f"➻ **Saved:** {writes['flushed']} in {writes['flushes']} batches\n"
+            f"➻ **Flush latency:** {writes['last_latency'] * 1000:.0f} ms last, "
+            f"{writes['avg_latency'] * 1000:.0f} ms avg\n"
+            f"➻ **Failed batches:** {writes['failed']}, **dropped:** {writes['dropped']}\n\n"
+            f"**Translations:** {translations['memory']['entries']} cached, "
+            f"{translations['memory']['bytes'] / 2**20:.1f} MiB\n"
+            f"➻ **Hit ratio:** {translations['hit_ratio']:.1%} "
+            f"({translations['memory_hit_ratio']:.1%} from memory)\n"
+            f"➻ **Translated:** {translations['translated']}, **failed:** {translations['failed']}, "
+            f"{translations['avg_translate'] * 1000:.0f} ms avg\n"
+            f"➻ **Time saved:** {translations['saved']:.0f} s\n"
+            f"➻ **Timeouts:** {translations['timeouts']}, **coalesced:** {translations['coalesced']}, "
+            f"**skipped:** {translations['skipped']}\n"
+            f"➻ **Backend:** {translations['backend']} {translations['breaker']} "
+            f"({translations['breaker_opens']} trips), {translations['running']} running, "
+            f"{translations['batched']} texts in {translations['backend_calls']} calls\n\n"
+            f"**Chat settings:** {settings['entries']} cached\n"
+            f"➻ **Hits:** {settings['hits']}, **unset:** {settings['negative_hits']}, "
+            f"**misses:** {settings['misses']}"
+        )
+    except Exception as e:
+        await message.reply_text(f"Error: {e}")
+
 async def save_reply(original_message: Message, reply_message: Message):
-    global replies_cache
     try:
         if (original_message.text and await is_abuse_present(original_message.text)) or \
            (reply_message.text and await is_abuse_present(reply_message.text)):
@@ -140,36 +166,15 @@ async def save_reply(original_message: Message, reply_message: Message):
             reply_data["text"] = translated_text
             reply_data["check"] = "none"
 
-        is_chat = await chatai.find_one(reply_data)
-        if not is_chat:
-            await chatai.insert_one(reply_data)
-            replies_cache.append(reply_data)
+        await add_learned_reply(reply_data)
 
     except Exception as e:
         print(f"Error in save_reply: {e}")
 
-async def load_replies_cache():
-    global replies_cache
-    replies_cache = await chatai.find().to_list(length=None)
-    await load_abuse_cache()
-
-
 async def get_reply(word: str):
-    global replies_cache
-    if not replies_cache:
-        await load_replies_cache()
-        
-    relevant_replies = [reply for reply in replies_cache if reply['word'] == word]
-    if not relevant_replies:
-        relevant_replies = replies_cache
-    return random.choice(relevant_replies) if relevant_replies else None
+    return await get_learned_reply(word)
 
 
-async def get_chat_language(chat_id):
-    chat_lang = await lang_db.find_one({"chat_id": chat_id})
-    return chat_lang["language"] if chat_lang and "language" in chat_lang else None
-    
-            
 @nexichat.on_message(filters.incoming)
 async def chatbot_response(client: Client, message: Message):
     global blocklist, message_counts
@@ -199,9 +204,7 @@ async def chatbot_response(client: Client, message: Message):
                 return
         chat_id = message.chat.id
       
-        chat_status = await status_db.find_one({"chat_id": chat_id})
-        
-        if chat_status and chat_status.get("status") == "disabled":
+        if not await is_chatbot_enabled(chat_id):
             return
 
         if message.text and any(message.text.startswith(prefix) for prefix in ["!", "/", ".", "?", "@", "#"]):
@@ -210,6 +213,9 @@ async def chatbot_response(client: Client, message: Message):
             else:
                 return await add_served_user(chat_id)
         
+        if message.reply_to_message:
+            reply_answered(chat_id, message.reply_to_message.id)
+
         if (message.reply_to_message and message.reply_to_message.from_user.id == nexichat.id) or not message.reply_to_message:
             reply_data = await get_reply(message.text)
 
@@ -217,26 +223,26 @@ async def chatbot_response(client: Client, message: Message):
                 response_text = reply_data["text"]
                 chat_lang = await get_chat_language(chat_id)
 
-                if not chat_lang or chat_lang == "nolang":
+                if not chat_lang or chat_lang == "nolang" or reply_data["check"] != "none":
                     translated_text = response_text
                 else:
-                    translated_text = GoogleTranslator(source='auto', target=chat_lang).translate(response_text)
-                    if not translated_text:
-                        translated_text = response_text
+                    translated_text = await translate_reply(response_text, chat_lang)
                 if reply_data["check"] == "sticker":
-                    await message.reply_sticker(reply_data["text"])
+                    sent = await message.reply_sticker(reply_data["text"])
                 elif reply_data["check"] == "photo":
-                    await message.reply_photo(reply_data["text"])
+                    sent = await message.reply_photo(reply_data["text"])
                 elif reply_data["check"] == "video":
-                    await message.reply_video(reply_data["text"])
+                    sent = await message.reply_video(reply_data["text"])
                 elif reply_data["check"] == "audio":
-                    await message.reply_audio(reply_data["text"])
+                    sent = await message.reply_audio(reply_data["text"])
                 elif reply_data["check"] == "gif":
-                    await message.reply_animation(reply_data["text"])
+                    sent = await message.reply_animation(reply_data["text"])
                 elif reply_data["check"] == "voice":
-                    await message.reply_voice(reply_data["text"])
+                    sent = await message.reply_voice(reply_data["text"])
                 else:
-                    await message.reply_text(translated_text)
+                    sent = await message.reply_text(translated_text)
+                if sent:
+                    reply_sent(chat_id, sent.id, reply_data)
             else:
                 await message.reply_text("**I don't understand. What are you saying?**")
 
@@ -16,9 +16,10 @@ from pyrogram import Client, filters
 from nexichat import CLONE_OWNERS, db
 from config import OWNER_ID, MONGO_URL, OWNER_USERNAME
 from pyrogram.errors import FloodWait, ChatAdminRequired
-from nexichat.database.chats import get_served_chats, add_served_chat
-from nexichat.database.users import get_served_users, add_served_user
-from nexichat.database.clonestats import get_served_cchats, get_served_cusers, add_served_cuser, add_served_cchat
+from nexichat.database.chats import add_served_chat
+from nexichat.database.users import add_served_user
+from nexichat.database.clonestats import (get_served_cchats, get_served_cchats_count, get_served_cusers,
+                                          get_served_cusers_count, add_served_cuser, add_served_cchat)
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, CallbackQuery
 from nexichat.mplugin.helpers import (
     START,
@@ -119,8 +120,8 @@ async def welcomejej(client, message: Message):
     await add_served_cchat(bot_id, message.chat.id)
     await add_served_chat(message.chat.id)
     await set_default_status(message.chat.id)
-    users = len(await get_served_cusers(bot_id))
-    chats = len(await get_served_cchats(bot_id))
+    users = await get_served_cusers_count(bot_id)
+    chats = await get_served_cchats_count(bot_id)
     try:
         for member in message.new_chat_members:
             if member.id == client.me.id:
@@ -186,8 +187,8 @@ async def welcomejej(client, message: Message):
 @Client.on_message(filters.command(["start", "aistart"]))
 async def start(client: Client, m: Message):
     bot_id = client.me.id
-    users = len(await get_served_cusers(bot_id))
-    chats = len(await get_served_cchats(bot_id))
+    users = await get_served_cusers_count(bot_id)
+    chats = await get_served_cchats_count(bot_id)
     
     if m.chat.type == ChatType.PRIVATE:
         accha = await m.reply_text(
@@ -215,8 +216,8 @@ async def start(client: Client, m: Message):
             except AttributeError:
                 chat_photo = BOT  
 
-        users = len(await get_served_cusers(bot_id))
-        chats = len(await get_served_cchats(bot_id))
+        users = await get_served_cusers_count(bot_id)
+        chats = await get_served_cchats_count(bot_id)
         UP, CPU, RAM, DISK = await bot_sys_stats()
         await m.reply_photo(photo=chat_photo, caption=START.format(users, chats, UP), reply_markup=InlineKeyboardMarkup(START_BOT))
         await m.reply_text(f"**{AUTO_MSG}**")
@@ -300,8 +301,8 @@ async def ping(client: Client, message: Message):
 @Client.on_message(filters.command("stats"))
 async def stats(cli: Client, message: Message):
     bot_id = (await cli.get_me()).id
-    users = len(await get_served_cusers(bot_id))
-    chats = len(await get_served_cchats(bot_id))
+    users = await get_served_cusers_count(bot_id)
+    chats = await get_served_cchats_count(bot_id)
     
     await message.reply_text(
         f"""{(await cli.get_me()).mention} Chatbot Stats:
@@ -8,7 +8,7 @@ from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message,
 
 from nexichat import nexichat, db
 from config import LANG_DETECTION_API
-from nexichat.utils.helpers import get_chat_language, set_chat_language
+from nexichat.database.settings import get_chat_language, set_chat_language
 
 # Message cache with TTL (300 seconds = 5 minutes)
 message_cache: Dict[int, List[Message]] = {}
@@ -19,7 +19,7 @@ CACHE_TTL = 300
 async def chat_lang_handler(client: Client, message: Message):
     """Get current chat language"""
     chat_id = message.chat.id
-    lang = await get_chat_language(chat_id)
+    lang = await get_chat_language(chat_id, client.me.id)
     await message.reply(f"🌐 Current chat language: {lang or 'Not set!'}")
 
 @nexichat.on_callback_query(filters.regex("^choose_lang$"))
@@ -44,7 +44,7 @@ async def set_lang_handler(client: Client, query: CallbackQuery):
         return
     
     chat_id = query.message.chat.id
-    await set_chat_language(chat_id, lang_code)
+    await set_chat_language(chat_id, lang_code, client.me.id)
     await query.answer(f"Language set to {lang_code.upper()}!")
     await query.message.edit_text(f"✅ Successfully set language to {lang_code.upper()}")
 
@@ -104,7 +104,7 @@ async def message_store_handler(client: Client, message: Message):
     chat_id = message.chat.id
     
     # Check existing language
-    current_lang = await get_chat_language(chat_id)
+    current_lang = await get_chat_language(chat_id, client.me.id)
     if current_lang and current_lang != "nolang":
         return
     
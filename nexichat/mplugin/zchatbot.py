@@ -1,70 +1,56 @@
 import asyncio
 import random
-from typing import Dict, List, Optional
+from typing import Dict, Optional
 
-from deep_translator import GoogleTranslator
-from pymongo import MongoClient
 from pyrogram import Client, filters
 from pyrogram.enums import ChatAction, ChatMemberStatus as CMS
 from pyrogram.errors import MessageEmpty
 from pyrogram.types import (CallbackQuery, InlineKeyboardButton,
                             InlineKeyboardMarkup, Message)
 
-from config import MONGO_URL, OWNER_ID
-from nexichat import LOGGER, db, mongo, nexichat
-from nexichat.database import abuse_list, add_served_cchat, add_served_cuser, chatai
+from config import OWNER_ID
+from nexichat import LOGGER, mongo, nexichat
+from nexichat.database import (abuse_filter, add_abuse_word, add_learned_reply, add_served_cchat,
+                               add_served_cuser, get_chat_language, get_learned_reply, is_abuse_present,
+                               is_chatbot_enabled, load_abuse_words, load_replies, remove_abuse_word,
+                               replies_cache, reply_answered, reply_sent, start_purge, translate_reply)
 from nexichat.database.chats import add_served_chat
 from nexichat.database.users import add_served_user
 from nexichat.mplugin.helpers import languages
-
-# Initialize MongoDB client
-mongo_client = MongoClient(MONGO_URL)
-db = mongo_client.nexichat
-
-# Collections
-lang_db = db.chat_langs
-status_db = db.chat_status
-abuse_words_db = db.abuse_words
+from nexichat.utils.abuse import MODES
+from nexichat.utils.replyindex import Reply
 
 # Caches
-replies_cache: List[Dict] = []
-abuse_cache: List[str] = []
 message_counts: Dict[int, int] = {}
 
 async def initialize_caches():
     """Initialize all caches from database"""
     await asyncio.gather(
-        load_abuse_cache(),
+        load_abuse_words(),
         load_replies_cache()
     )
 
-async def load_abuse_cache():
-    """Load abuse words from database"""
-    global abuse_cache
-    abuse_cache = [doc["word"] async for doc in abuse_words_db.find()]
-    LOGGER.info(f"Loaded {len(abuse_cache)} abuse words")
-
-async def add_abuse_word(word: str):
-    """Add word to abuse list"""
-    if word.lower() not in abuse_cache:
-        await abuse_words_db.insert_one({"word": word.lower()})
-        abuse_cache.append(word.lower())
-        LOGGER.info(f"Added abuse word: {word}")
-
-async def is_abusive(text: str) -> bool:
-    """Check if text contains abusive content"""
-    text_lower = text.lower()
-    return any(word in text_lower for word in abuse_cache + abuse_list)
+def purge_progress(status: Message, header: str):
+    """Edit the /block reply with the purge progress"""
+    async def progress(scanned: int, deleted: int, done: bool):
+        state = "✅ Purge done" if done else "🧹 Purging"
+        await status.edit_text(f"{header}\n{state}: {scanned} learned replies scanned, {deleted} removed")
+    return progress
 
 @nexichat.on_message(filters.command("block") & filters.user(OWNER_ID))
 async def block_word(client: Client, message: Message):
     """Block a word"""
     if len(message.command) < 2:
-        return await message.reply("⚠️ Usage: /block <word>")
+        return await message.reply("⚠️ Usage: /block <word> [token|substring]")
     
     word = message.command[1].lower()
-    await add_abuse_word(word)
-    await message.reply(f"✅ Successfully blocked word: `{word}`")
+    mode = message.command[2].lower() if len(message.command) > 2 else None
+    if mode is not None and mode not in MODES:
+        return await message.reply(f"❌ Unknown mode: `{mode}`, use token or substring")
+    await add_abuse_word(word, mode)
+    header = f"✅ Successfully blocked word: `{word}` ({abuse_filter.mode(word)} match)"
+    status = await message.reply(f"{header}\n🧹 Removing learned replies that contain it...")
+    await start_purge([(word, mode)], purge_progress(status, header))
 
 @nexichat.on_message(filters.command("unblock") & filters.user(OWNER_ID))
 async def unblock_word(client: Client, message: Message):
@@ -73,9 +59,7 @@ async def unblock_word(client: Client, message: Message):
         return await message.reply("⚠️ Usage: /unblock <word>")
     
     word = message.command[1].lower()
-    if word in abuse_cache:
-        await abuse_words_db.delete_one({"word": word})
-        abuse_cache.remove(word)
+    if await remove_abuse_word(word):
         await message.reply(f"✅ Successfully unblocked word: `{word}`")
     else:
         await message.reply(f"❌ Word not found: `{word}`")
@@ -83,16 +67,17 @@ async def unblock_word(client: Client, message: Message):
 @nexichat.on_message(filters.command("blocked") & filters.user(OWNER_ID))
 async def list_blocked_words(client: Client, message: Message):
     """List blocked words"""
-    if not abuse_cache:
+    await load_abuse_words()
+    if not abuse_filter.words:
         return await message.reply("❌ No words blocked yet")
     
-    words = "\n".join(f"• `{word}`" for word in abuse_cache)
+    words = "\n".join(f"• `{word}` ({abuse_filter.mode(word)})" for word in abuse_filter.words)
     await message.reply(f"🚫 Blocked Words:\n{words}")
 
 async def save_reply(original: Message, reply: Message):
     """Save reply pattern to database"""
     try:
-        if await is_abusive(original.text or "") or await is_abusive(reply.text or ""):
+        if await is_abuse_present(original.text or "") or await is_abuse_present(reply.text or ""):
             return
 
         reply_data = {
@@ -121,31 +106,19 @@ async def save_reply(original: Message, reply: Message):
         else:
             reply_data["text"] = reply.text
 
-        if not await chatai.find_one(reply_data):
-            await chatai.insert_one(reply_data)
-            replies_cache.append(reply_data)
+        await add_learned_reply(reply_data)
 
     except Exception as e:
         LOGGER.error(f"Error saving reply: {e}")
 
 async def load_replies_cache():
     """Load replies from database"""
-    global replies_cache
-    replies_cache = await chatai.find().to_list(length=None)
+    await load_replies()
     LOGGER.info(f"Loaded {len(replies_cache)} replies")
 
-async def get_chat_language(chat_id: int) -> Optional[str]:
-    """Get chat language preference"""
-    lang = await lang_db.find_one({"chat_id": chat_id})
-    return lang.get("language") if lang else "en"
-
-async def get_response(text: str) -> Optional[Dict]:
+async def get_response(text: str) -> Optional[Reply]:
     """Get random matching response"""
-    if not replies_cache:
-        await load_replies_cache()
-    
-    matches = [r for r in replies_cache if r["word"] == text]
-    return random.choice(matches or replies_cache)
+    return await get_learned_reply(text)
 
 @nexichat.on_message(filters.text & ~filters.bot & ~filters.edited)
 async def handle_chat(client: Client, message: Message):
@@ -155,8 +128,7 @@ async def handle_chat(client: Client, message: Message):
         bot_id = client.me.id
         
         # Check chatbot status
-        status = await status_db.find_one({"chat_id": chat_id})
-        if status and status.get("status") == "disabled":
+        if not await is_chatbot_enabled(chat_id, bot_id):
             return
 
         # Update user/chat stats
@@ -167,21 +139,28 @@ async def handle_chat(client: Client, message: Message):
             await add_served_cuser(bot_id, chat_id)
             await add_served_user(chat_id)
 
+        # Credit the reply this message answers
+        if message.reply_to_message:
+            reply_answered(chat_id, message.reply_to_message.id)
+
         # Generate response
         response = await get_response(message.text)
         if not response:
             return await message.reply("🤖 I'm still learning, please teach me!")
 
-        # Translate response
-        lang = await get_chat_language(chat_id)
-        translated = GoogleTranslator(source="auto", target=lang).translate(response["text"])
-
-        # Send response
+        # Send response, translated into the chat's language
         media_type = response.get("media_type")
         if media_type and media_type != "text":
-            await getattr(message, f"reply_{media_type}")(response["text"])
+            sent = await getattr(message, f"reply_{media_type}")(response["text"])
         else:
-            await message.reply(translated or response["text"])
+            # Clone chats without a language get English, as before the shared settings
+            lang = await get_chat_language(chat_id, bot_id) or "en"
+            text = response["text"]
+            if lang and lang != "nolang":
+                text = await translate_reply(text, lang)
+            sent = await message.reply(text)
+        if sent:
+            reply_sent(chat_id, sent.id, response)
 
         # Save conversation pattern
         if message.reply_to_message and message.reply_to_message.from_user.is_self:
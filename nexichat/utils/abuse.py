@@ -0,0 +1,88 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from nexichat.utils.ahocorasick import Automaton
+from nexichat.utils.normalize import abuse_key
+
+TOKEN = "token"
+SUBSTRING = "substring"
+MODES = (TOKEN, SUBSTRING)
+# Entries this short are common inside clean words ("mar", "hag", "goo")
+TOKEN_MAX_LEN = 4
+
+
+def default_mode(key: str) -> str:
+    return TOKEN if len(key) <= TOKEN_MAX_LEN else SUBSTRING
+
+
+class AbuseMatcher:
+    """Compiled abuse patterns, each matched as a whole token or as a substring
+
+    Patterns and messages are compared in their abuse_key() form, where
+    tokens are separated by single spaces.
+    """
+
+    __slots__ = ("modes", "automaton")
+
+    def __init__(self, words: Iterable[Tuple[str, Optional[str]]]):
+        modes: Dict[str, str] = {}
+        for word, mode in words:
+            key = abuse_key(word)
+            if not key:
+                continue
+            mode = mode if mode in MODES else default_mode(key)
+            # The same canonical pattern listed twice: substring is the stricter
+            if modes.get(key) != SUBSTRING:
+                modes[key] = mode
+        self.modes = modes
+        self.automaton = Automaton(modes)
+
+    def __len__(self) -> int:
+        return len(self.modes)
+
+    def match(self, text: str, cached: bool = True) -> Optional[str]:
+        """Return the first pattern found in text, if any
+
+        Bulk scans pass cached=False so they do not evict the keys of live messages.
+        """
+        key = abuse_key(text) if cached else abuse_key.__wrapped__(text)
+        modes = self.modes
+        for start, pattern in self.automaton.finditer(key):
+            if modes[pattern] == SUBSTRING:
+                return pattern
+            end = start + len(pattern)
+            if (start == 0 or key[start - 1] == " ") and (end == len(key) or key[end] == " "):
+                return pattern
+        return None
+
+    def search(self, text: str, cached: bool = True) -> bool:
+        return self.match(text, cached) is not None
+
+
+class AbuseFilter:
+    """Blocked words and their compiled matcher, swapped in together
+
+    One instance is shared by every plugin tree and clone client. version
+    is the stamp the words were loaded at, None before the first load.
+    """
+
+    __slots__ = ("builtin", "words", "matcher", "version")
+
+    def __init__(self, builtin: Iterable[str]):
+        self.builtin: Tuple[str, ...] = tuple(builtin)
+        self.words: Dict[str, Optional[str]] = {}  # word -> match mode, None for the default
+        self.matcher = AbuseMatcher((word, None) for word in self.builtin)
+        self.version: Optional[int] = None
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.words
+
+    def update(self, words: Dict[str, Optional[str]], version: Optional[int]):
+        matcher = AbuseMatcher([(word, None) for word in self.builtin] + list(words.items()))
+        self.words, self.matcher, self.version = words, matcher, version
+
+    def mode(self, word: str) -> str:
+        """The mode a blocked word is matched in, resolving the default"""
+        return self.words.get(word) or default_mode(abuse_key(word))
+
+    def search(self, text: str) -> bool:
+        return self.matcher.search(text)
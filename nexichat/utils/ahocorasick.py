@@ -0,0 +1,73 @@
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+class Automaton:
+    """Aho-Corasick automaton for scanning text against many patterns at once
+
+    Built once from the patterns and never modified; to change the pattern
+    set, build a new automaton and swap it in. Matching is case sensitive,
+    callers lowercase both sides.
+    """
+
+    __slots__ = ("patterns", "goto", "fail", "output")
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = list(dict.fromkeys(p for p in patterns if p))
+        goto: List[Dict[str, int]] = [{}]
+        output: List[Tuple[int, ...]] = [()]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = goto[state][char] = len(goto)
+                    goto.append({})
+                    output.append(())
+                state = nxt
+            output[state] += (index,)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                link = fail[state]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                link = goto[link].get(char, 0)
+                fail[nxt] = link if link != nxt else 0
+                # Patterns that are suffixes of this one end here too
+                if output[fail[nxt]]:
+                    output[nxt] += output[fail[nxt]]
+        self.goto = goto
+        self.fail = fail
+        self.output = output
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def search(self, text: str) -> bool:
+        """True if any pattern occurs in text"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                return True
+        return False
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (start, pattern) for every occurrence in text"""
+        goto, fail, output, patterns = self.goto, self.fail, self.output, self.patterns
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                pattern = patterns[index]
+                yield end - len(pattern), pattern
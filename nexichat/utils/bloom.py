@@ -0,0 +1,71 @@
+import hashlib
+import math
+import struct
+
+HEADER = struct.Struct("<QQdB")
+# One blake2b digest (at most 64 bytes) supplies every probe as a u32
+MAX_HASHES = 16
+
+
+class BloomFilter:
+    """Bloom filter over strings with a stable (process independent) hash
+
+    Never reports a missing key for an added one; reports a key that was
+    never added with probability about error_rate while count <= capacity.
+    """
+
+    __slots__ = ("capacity", "error_rate", "size", "hashes", "count", "bits", "_unpack")
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = min(max(round(self.size / self.capacity * math.log(2)), 1), MAX_HASHES)
+        self.count = 0
+        self.bits = bytearray((self.size + 7) // 8)
+        self._unpack = struct.Struct(f"<{self.hashes}I").unpack
+
+    def _hashes(self, key: str):
+        return self._unpack(
+            hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=4 * self.hashes).digest()
+        )
+
+    def add(self, key: str):
+        bits = self.bits
+        size = self.size
+        for h in self._hashes(key):
+            pos = h % size
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        size = self.size
+        for h in self._hashes(key):
+            pos = h % size
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def full(self) -> bool:
+        return self.count > self.capacity
+
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    def to_bytes(self) -> bytes:
+        return HEADER.pack(self.capacity, self.count, self.error_rate, self.hashes) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data) -> "BloomFilter":
+        capacity, count, error_rate, hashes = HEADER.unpack_from(data, 0)
+        bloom = cls(capacity, error_rate)
+        if hashes != bloom.hashes or len(data) - HEADER.size != len(bloom.bits):
+            raise ValueError("bloom filter parameters do not match its data")
+        bloom.count = count
+        bloom.bits[:] = data[HEADER.size:]
+        return bloom
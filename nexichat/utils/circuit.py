@@ -0,0 +1,54 @@
+import time
+from typing import Callable
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """Stops calling a failing backend for a while, then lets one probe through
+
+    After max_failures consecutive failures the circuit opens and allow()
+    refuses calls for reset_after seconds. The first call after that is a
+    probe: its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, max_failures: int = 5, reset_after: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_failures = max_failures
+        self.reset_after = reset_after
+        self._clock = clock
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.max_failures:
+            return CLOSED
+        if self.probing or self._clock() - self.opened_at >= self.reset_after:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> bool:
+        """True if a call may go through now"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self.probing or self.failures == self.max_failures:
+            self.opened_at = self._clock()
+            self.opens += 1
+        self.probing = False
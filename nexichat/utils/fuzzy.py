@@ -0,0 +1,117 @@
+import heapq
+import math
+import unicodedata
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Tuple
+
+EMPTY = array("I")
+
+
+@lru_cache(maxsize=65536)
+def fuzzy_key(text: str) -> str:
+    """Fold casing, punctuation and elongated letters ("Hiii!!" -> "hi")"""
+    chars = []
+    prev = ""
+    for ch in unicodedata.normalize("NFKC", text).casefold():
+        if unicodedata.category(ch)[0] in "LMN":
+            if ch != prev:
+                chars.append(ch)
+            prev = ch
+        else:
+            if chars and chars[-1] != " ":
+                chars.append(" ")
+            prev = " "
+    return "".join(chars).strip()
+
+
+def trigrams(key: str) -> FrozenSet[str]:
+    """Character trigrams of a fuzzy key, padded so short words still match"""
+    padded = f" {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    """Inverted index from character trigrams to trigger words
+
+    Lookups only walk the rarest posting lists a match could come from
+    (prefix filtering) and verify a bounded number of candidates, so the
+    cost stays flat as the corpus grows.
+    """
+
+    def __init__(self, max_postings: int = 4096, max_candidates: int = 32):
+        self.max_postings = max_postings
+        self.max_candidates = max_candidates
+        self.ids: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.labels: List[List[str]] = []
+        self.sizes = array("H")
+        self.postings: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def clear(self):
+        self.__init__(self.max_postings, self.max_candidates)
+
+    def add(self, label: str):
+        """Index a trigger word; labels sharing a fuzzy key share one entry"""
+        key = fuzzy_key(label)
+        if not key:
+            return
+        doc_id = self.ids.get(key)
+        if doc_id is not None:
+            if label not in self.labels[doc_id]:
+                self.labels[doc_id].append(label)
+            return
+        doc_id = len(self.keys)
+        grams = trigrams(key)
+        self.ids[key] = doc_id
+        self.keys.append(key)
+        self.labels.append([label])
+        self.sizes.append(min(len(grams), 0xFFFF))
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings is None:
+                postings = self.postings[gram] = array("I")
+            postings.append(doc_id)
+
+    def search(self, text: str, k: int = 5, threshold: float = 0.5) -> List[Tuple[float, List[str]]]:
+        """Return up to k (jaccard score, labels) pairs scoring at least threshold"""
+        key = fuzzy_key(text or "")
+        if not key:
+            return []
+        doc_id = self.ids.get(key)
+        if doc_id is not None:
+            return [(1.0, self.labels[doc_id])]
+
+        grams = trigrams(key)
+        size = len(grams)
+        lists = sorted((self.postings.get(gram, EMPTY) for gram in grams), key=len)
+        # Any trigger with jaccard >= threshold shares at least one of these grams.
+        prefix = size - math.ceil(threshold * size) + 1
+        min_size = threshold * size
+        max_size = size / threshold if threshold else float("inf")
+
+        counts: Counter = Counter()
+        budget = self.max_postings
+        for postings in lists[:prefix]:
+            if budget <= 0:
+                break
+            if len(postings) > budget:
+                postings = postings[:budget]
+            budget -= len(postings)
+            counts.update(postings)
+
+        scored = []
+        sizes = self.sizes
+        for doc_id, _ in counts.most_common(self.max_candidates):
+            if not min_size <= sizes[doc_id] <= max_size:
+                continue
+            other = trigrams(self.keys[doc_id])
+            common = len(grams & other)
+            score = common / (size + len(other) - common)
+            if score >= threshold:
+                scored.append((score, doc_id))
+        return [(score, self.labels[doc_id]) for score, doc_id in heapq.nlargest(k, scored)]
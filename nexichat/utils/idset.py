@@ -0,0 +1,65 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, Set
+
+
+class IdSet:
+    """Exact set of 64-bit ints stored as a sorted array, about 8 bytes per id
+
+    Additions land in a small set that is merged into the array once it
+    holds merge_at ids, so adds stay cheap and lookups are a set probe plus
+    a binary search.
+    """
+
+    __slots__ = ("ids", "recent", "merge_at")
+
+    def __init__(self, ids: Iterable[int] = (), merge_at: int = 4096):
+        self.ids = array("q", sorted(set(ids)))
+        self.recent: Set[int] = set()
+        self.merge_at = merge_at
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.recent)
+
+    def __iter__(self) -> Iterator[int]:
+        yield from self.ids
+        yield from self.recent
+
+    def __contains__(self, item: int) -> bool:
+        if item in self.recent:
+            return True
+        ids = self.ids
+        i = bisect_left(ids, item)
+        return i < len(ids) and ids[i] == item
+
+    def add(self, item: int) -> bool:
+        """Add an id, returns False if it was already present"""
+        if item in self:
+            return False
+        self.recent.add(item)
+        if len(self.recent) >= self.merge_at:
+            self.merge()
+        return True
+
+    def update(self, items: Iterable[int]):
+        self.recent.update(item for item in list(items) if item not in self)
+        self.merge()
+
+    def discard(self, item: int):
+        if item in self.recent:
+            self.recent.discard(item)
+            return
+        ids = self.ids
+        i = bisect_left(ids, item)
+        if i < len(ids) and ids[i] == item:
+            del ids[i]
+
+    def merge(self):
+        if self.recent:
+            self.ids = array("q", sorted(self.ids.tolist() + list(self.recent)))
+            self.recent.clear()
+
+    @property
+    def nbytes(self) -> int:
+        # Set slots are estimated at 32 bytes plus a small int object each
+        return self.ids.itemsize * len(self.ids) + 60 * len(self.recent)
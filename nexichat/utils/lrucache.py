@@ -0,0 +1,66 @@
+import sys
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+class ByteLRU:
+    """LRU mapping of str values bounded by their approximate size in bytes
+
+    Sizes are sys.getsizeof of the key and the value, so the bound tracks
+    what the entries actually hold in memory rather than their count.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    @staticmethod
+    def _size(key: Hashable, value: str) -> int:
+        return sys.getsizeof(key) + sys.getsizeof(value)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: str):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= self._size(key, old)
+        size = self._size(key, value)
+        if size > self.max_bytes:
+            return
+        self.entries[key] = value
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            evicted, evicted_value = self.entries.popitem(last=False)
+            self.bytes -= self._size(evicted, evicted_value)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,129 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List
+
+# Romanized the way Hinglish is usually typed, so "चोद" meets "chod"
+DEVANAGARI_CONSONANTS = {
+    "क": "k", "ख": "kh", "ग": "g", "घ": "gh", "ङ": "n",
+    "च": "ch", "छ": "chh", "ज": "j", "झ": "jh", "ञ": "n",
+    "ट": "t", "ठ": "th", "ड": "d", "ढ": "dh", "ण": "n",
+    "त": "t", "थ": "th", "द": "d", "ध": "dh", "न": "n",
+    "प": "p", "फ": "ph", "ब": "b", "भ": "bh", "म": "m",
+    "य": "y", "र": "r", "ल": "l", "व": "v", "श": "sh",
+    "ष": "sh", "स": "s", "ह": "h",
+}
+# Consonants whose sound changes under a nukta
+DEVANAGARI_NUKTA = {"क": "q", "ख": "kh", "ग": "g", "ज": "z", "ड": "r", "ढ": "rh", "फ": "f", "य": "y"}
+# Standalone long vowels keep their length ("आंड" -> "aand", not "and");
+# vowel signs stay short as typed ("चूतिया" -> "chutiya")
+DEVANAGARI_VOWELS = {
+    "अ": "a", "आ": "aa", "इ": "i", "ई": "ee", "उ": "u", "ऊ": "oo", "ऋ": "ri",
+    "ए": "e", "ऐ": "ai", "ओ": "o", "औ": "au",
+}
+DEVANAGARI_SIGNS = {
+    "ा": "a", "ि": "i", "ी": "i", "ु": "u", "ू": "u", "ृ": "ri",
+    "े": "e", "ै": "ai", "ो": "o", "ौ": "au",
+}
+DEVANAGARI_MARKS = {"ं": "n", "ँ": "n", "ः": "h"}
+NUKTA = "़"
+VIRAMA = "्"
+
+# Cyrillic/Greek look-alikes and leetspeak, applied after casefolding
+FOLD = str.maketrans({
+    "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h", "о": "o",
+    "р": "p", "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ї": "i", "ј": "j",
+    "ѕ": "s", "ԁ": "d", "ɡ": "g",
+    "α": "a", "β": "b", "ε": "e", "η": "n", "ι": "i", "κ": "k", "ν": "v", "ο": "o",
+    "ρ": "p", "τ": "t", "υ": "u", "χ": "x", "ω": "w",
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "@": "a", "$": "s",
+})
+# Runs of three or more collapse; doubled letters carry meaning ("aand")
+STRETCHED = re.compile(r"(.)\1{2,}")
+PUNCTUATION = re.compile(r"[^\w\s]|_")
+
+
+def _devanagari(text: str) -> str:
+    """Romanize Devanagari runs, dropping inherent vowels Hindi does not say"""
+    # (consonants, vowel, inherent) syllables; vowel None for text outside Devanagari
+    units: List[list] = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        consonant = DEVANAGARI_CONSONANTS.get(char)
+        if consonant is not None:
+            if text[i + 1:i + 2] == NUKTA:
+                consonant = DEVANAGARI_NUKTA.get(char, consonant)
+                i += 1
+            sign = text[i + 1:i + 2]
+            if sign == VIRAMA:
+                units.append([consonant, "", False])
+                i += 1
+            elif sign in DEVANAGARI_SIGNS:
+                units.append([consonant, DEVANAGARI_SIGNS[sign], False])
+                i += 1
+            else:
+                units.append([consonant, "a", True])
+        elif char in DEVANAGARI_VOWELS:
+            units.append(["", DEVANAGARI_VOWELS[char], False])
+        elif char in DEVANAGARI_MARKS:
+            units.append([DEVANAGARI_MARKS[char], "", False])
+        elif char != NUKTA:
+            units.append([char, None, False])
+        i += 1
+
+    def spoken(index: int) -> bool:
+        return 0 <= index < len(units) and bool(units[index][1])
+
+    # Schwa deletion, right to left: a word-final inherent vowel goes, and so
+    # does one between a vowel and a consonant that carries its own vowel.
+    index = len(units) - 1
+    while index >= 0:
+        consonant, vowel, inherent = units[index]
+        if inherent:
+            last = index + 1 == len(units) or units[index + 1][1] is None
+            if last and index > 0 and units[index - 1][1] is not None:
+                units[index][1] = ""
+            elif spoken(index - 1) and spoken(index + 1) and units[index + 1][0]:
+                units[index][1] = ""
+                index -= 1
+        index -= 1
+    return "".join(consonant + (vowel or "") for consonant, vowel, _ in units)
+
+
+def _has_devanagari(text: str) -> bool:
+    return any("ऀ" <= char <= "ॿ" for char in text)
+
+
+@lru_cache(maxsize=65536)
+def abuse_key(text: str) -> str:
+    """Canonical form of a message or pattern for abuse matching
+
+    NFKC + casefold, Devanagari romanized, accents and zero-width/format
+    characters stripped, look-alikes and leetspeak folded, punctuation
+    inside words dropped ("b.c." -> "bc"), spaced-out letters joined
+    ("b h o s d i" -> "bhosdi") and stretched letters collapsed.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    if not text.isascii():
+        if _has_devanagari(text):
+            text = _devanagari(text)
+        text = "".join(
+            char for char in unicodedata.normalize("NFKD", text)
+            if unicodedata.category(char) not in ("Mn", "Cf")
+        )
+    text = PUNCTUATION.sub("", text.translate(FOLD))
+
+    tokens = []
+    run: List[str] = []
+    for token in text.split():
+        if len(token) == 1:
+            run.append(token)
+            continue
+        if run:
+            tokens.append("".join(run))
+            run = []
+        tokens.append(token)
+    if run:
+        tokens.append("".join(run))
+    return STRETCHED.sub(r"\1", " ".join(tokens))
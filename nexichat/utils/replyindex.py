@@ -0,0 +1,354 @@
+import asyncio
+import logging
+import random
+import sys
+from enum import IntEnum
+from typing import Dict, Iterable, List, Optional
+
+from nexichat.utils.bloom import BloomFilter
+from nexichat.utils.fuzzy import TrigramIndex
+from nexichat.utils.sampler import FenwickSampler
+from nexichat.utils.tfidf import TfidfIndex
+
+LOGGER = logging.getLogger(__name__)
+
+STRATEGIES = ("exact", "fuzzy", "tfidf")
+# Buckets at least this large get a Fenwick sampler, smaller ones are scanned
+SAMPLER_MIN = 32
+
+
+class MediaType(IntEnum):
+    TEXT = 0
+    STICKER = 1
+    PHOTO = 2
+    VIDEO = 3
+    AUDIO = 4
+    ANIMATION = 5
+    VOICE = 6
+
+
+# "check" values written by the modules/idchatbot trees, "media_type" values by mplugin
+CHECK_NAMES = ("none", "sticker", "photo", "video", "audio", "gif", "voice")
+MEDIA_NAMES = ("text", "sticker", "photo", "video", "audio", "animation", "voice")
+MEDIA_LOOKUP = {name: MediaType(i) for names in (CHECK_NAMES, MEDIA_NAMES) for i, name in enumerate(names)}
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Reply:
+    """Compact learned reply; also readable like the old Mongo documents"""
+
+    __slots__ = ("word", "text", "media", "uses", "replied", "pos")
+
+    def __init__(self, word: Optional[str], text: Optional[str], media: MediaType = MediaType.TEXT,
+                 uses: int = 0, replied: int = 0):
+        self.word = word
+        self.text = text
+        self.media = media
+        self.uses = uses
+        self.replied = replied
+        self.pos = 0  # index in its trigger bucket, -1 once removed
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "Reply":
+        media = MEDIA_LOOKUP.get(doc.get("check") or doc.get("media_type"), MediaType.TEXT)
+        return cls(_intern(doc.get("word")), _intern(doc.get("text")), media,
+                   doc.get("uses", 0), doc.get("replied", 0))
+
+    @property
+    def weight(self) -> float:
+        """Smoothed share of sends that got a reply; new pairs start at 0.5"""
+        return (self.replied + 1) / (self.uses + 2)
+
+    @property
+    def check(self) -> str:
+        return CHECK_NAMES[self.media]
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_NAMES[self.media]
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self) -> str:
+        return f"Reply({self.word!r}, {self.text!r}, {self.media.name}, uses={self.uses}, replied={self.replied})"
+
+
+def normalize_word(word: Optional[str]) -> str:
+    """Normalize a trigger word into its index key"""
+    if not word:
+        return ""
+    return " ".join(word.casefold().split())
+
+
+class ReplyIndex:
+    """Learned replies bucketed by normalized trigger word
+
+    Replies within a bucket are drawn by weight (see Reply.weight). With a
+    bloom_error_rate, a Bloom filter over the trigger keys screens lookups
+    before the buckets. Unknown triggers are matched against the known ones before falling back to a
+    random reply, depending on the strategy:
+    exact - no similarity matching
+    fuzzy - trigram Jaccard search (TrigramIndex)
+    tfidf - trigram TF-IDF cosine search (TfidfIndex, needs numpy/scipy),
+            whose matrix is rebuilt in a worker thread as triggers arrive
+    """
+
+    def __init__(self, strategy: str = "fuzzy", fuzzy_threshold: float = 0.5,
+                 tfidf_threshold: float = 0.4, fuzzy_top_k: int = 5, bloom_error_rate: float = 0.0):
+        if strategy not in STRATEGIES:
+            LOGGER.warning(f"Unknown reply strategy {strategy!r}, using fuzzy")
+            strategy = "fuzzy"
+        if strategy == "tfidf" and not TfidfIndex.available:
+            LOGGER.warning("numpy/scipy not installed, using fuzzy reply strategy")
+            strategy = "fuzzy"
+        self.strategy = strategy
+        self.fuzzy_threshold = fuzzy_threshold
+        self.tfidf_threshold = tfidf_threshold
+        self.fuzzy_top_k = fuzzy_top_k
+        self.bloom_error_rate = bloom_error_rate
+        self.bloom: Optional[BloomFilter] = None
+        self.buckets: Dict[str, List[Reply]] = {}
+        self.pool: List[Reply] = []
+        self.removed = 0  # removed replies still sitting in the pool
+        self.samplers: Dict[str, FenwickSampler] = {}
+        self.fuzzy: Optional[TrigramIndex] = None
+        self.tfidf: Optional[TfidfIndex] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._reset_similarity()
+        self._build_bloom(1024)
+
+    def __len__(self) -> int:
+        return len(self.pool) - self.removed
+
+    def _reset_similarity(self):
+        self.samplers = {}
+        self.fuzzy = TrigramIndex() if self.strategy == "fuzzy" else None
+        self.tfidf = TfidfIndex() if self.strategy == "tfidf" else None
+
+    def _build_bloom(self, capacity: int):
+        if not self.bloom_error_rate:
+            self.bloom = None
+            return
+        bloom = BloomFilter(capacity, self.bloom_error_rate)
+        for key in self.buckets:
+            bloom.add(key)
+        self.bloom = bloom
+
+    def _add_similar(self, key: str):
+        if self.fuzzy is not None:
+            self.fuzzy.add(key)
+        elif self.tfidf is not None:
+            self.tfidf.add(key)
+
+    def _add_trigger(self, key: str):
+        if self.bloom is not None:
+            self.bloom.add(key)
+            if self.bloom.full:
+                self._build_bloom(self.bloom.capacity * 2)
+        self._add_similar(key)
+
+    def clear(self):
+        self.buckets = {}
+        self.pool = []
+        self.removed = 0
+        self._reset_similarity()
+        self._build_bloom(1024)
+
+    def load(self, replies: Iterable[Reply], bloom: Optional[BloomFilter] = None):
+        """Rebuild the index from a full corpus, reusing a Bloom filter built over the same triggers"""
+        buckets: Dict[str, List[Reply]] = {}
+        pool: List[Reply] = []
+        for reply in replies:
+            key = normalize_word(reply.word)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[sys.intern(key)] = []
+            reply.pos = len(bucket)
+            bucket.append(reply)
+            pool.append(reply)
+        self.buckets = buckets
+        self.pool = pool
+        self.removed = 0
+        self._reset_similarity()
+        if bloom is not None and bloom.error_rate == self.bloom_error_rate and len(bloom) == len(buckets):
+            self.bloom = bloom
+        else:
+            self._build_bloom(max(len(buckets) * 2, 1024))
+        for key in buckets:
+            self._add_similar(key)
+        self.schedule_rebuild()
+
+    def add(self, reply: Reply) -> bool:
+        """Index a single newly learned reply, returns False if already known"""
+        key = normalize_word(reply.word)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[sys.intern(key)] = []
+            self._add_trigger(key)
+            self.schedule_rebuild()
+        else:
+            for other in bucket:
+                if other.text == reply.text and other.media == reply.media and other.word == reply.word:
+                    return False
+        reply.pos = len(bucket)
+        bucket.append(reply)
+        self.pool.append(reply)
+        sampler = self.samplers.get(key)
+        if sampler is not None:
+            sampler.append(reply.weight)
+        return True
+
+    def count(self, reply: Reply, uses: int = 0, replied: int = 0):
+        """Record sends of / answers to a reply and reweight it in its bucket"""
+        reply.uses += uses
+        reply.replied += replied
+        sampler = self.samplers.get(normalize_word(reply.word))
+        if sampler is not None and 0 <= reply.pos < len(sampler):
+            sampler.update(reply.pos, reply.weight)
+
+    def remove(self, reply: Reply) -> bool:
+        """Drop the stored reply equal to this one, returns False if not indexed
+
+        The trigger stays known with an empty bucket, and the pool is
+        compacted lazily.
+        """
+        key = normalize_word(reply.word)
+        bucket = self.buckets.get(key)
+        if not bucket:
+            return False
+        for stored in bucket:
+            if stored.text == reply.text and stored.media == reply.media and stored.word == reply.word:
+                break
+        else:
+            return False
+        last = bucket.pop()
+        if last is not stored:
+            bucket[stored.pos] = last
+            last.pos = stored.pos
+        stored.pos = -1
+        self.samplers.pop(key, None)
+        self.removed += 1
+        if self.removed > len(self.pool) // 4:
+            self.compact()
+        return True
+
+    def compact(self):
+        """Drop removed replies from the pool"""
+        if self.removed:
+            self.pool = [reply for reply in self.pool if reply.pos >= 0]
+            self.removed = 0
+
+    def schedule_rebuild(self):
+        """Fold queued triggers into the TF-IDF matrix in the background"""
+        if self.tfidf is None or not self.tfidf.needs_rebuild():
+            return
+        if self._rebuild_task and not self._rebuild_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.tfidf.rebuild(self.tfidf.take_pending())
+            return
+        self._rebuild_task = loop.create_task(self._rebuild(loop))
+
+    async def _rebuild(self, loop):
+        tfidf = self.tfidf
+        while tfidf is self.tfidf and tfidf.pending:
+            try:
+                await loop.run_in_executor(None, tfidf.rebuild, tfidf.take_pending())
+            except Exception as e:
+                LOGGER.error(f"Error rebuilding tfidf index: {e}")
+                return
+
+    def known(self, key: str) -> bool:
+        """False if no trigger has this key, True if one probably has"""
+        return self.bloom is None or key in self.bloom
+
+    def lookup(self, word: Optional[str]) -> Optional[List[Reply]]:
+        """Return the reply bucket for a trigger word, if any"""
+        key = normalize_word(word)
+        return self.buckets.get(key) if self.known(key) else None
+
+    def similar_key(self, word: Optional[str]) -> Optional[str]:
+        """Return the closest known trigger key, if close enough"""
+        if not word:
+            return None
+        if self.fuzzy is not None and self.fuzzy_threshold:
+            matches = self.fuzzy.search(word, self.fuzzy_top_k, self.fuzzy_threshold)
+            if matches:
+                return random.choice(matches[0][1])
+        elif self.tfidf is not None and self.tfidf_threshold:
+            match = self.tfidf.search_batch([word], self.tfidf_threshold)[0]
+            if match:
+                return match[1]
+        return None
+
+    def lookup_similar(self, word: Optional[str]) -> Optional[List[Reply]]:
+        """Return the bucket of the closest known trigger word, if close enough"""
+        key = self.similar_key(word)
+        return self.buckets.get(key) if key is not None else None
+
+    def choose(self, key: str, bucket: List[Reply]) -> Reply:
+        """Draw a reply from a bucket by weight"""
+        if len(bucket) < SAMPLER_MIN:
+            return random.choices(bucket, [reply.weight for reply in bucket])[0]
+        sampler = self.samplers.get(key)
+        if sampler is None or len(sampler) != len(bucket):
+            sampler = self.samplers[key] = FenwickSampler(reply.weight for reply in bucket)
+        return bucket[sampler.sample()]
+
+    def random(self) -> Optional[Reply]:
+        """Pick a reply from the whole corpus"""
+        # Removed replies are at most a quarter of the pool, retries are rare
+        while self.pool:
+            reply = random.choice(self.pool)
+            if reply.pos >= 0:
+                return reply
+        return None
+
+    def get(self, word: Optional[str]) -> Optional[Reply]:
+        """Pick a reply for a trigger word, falling back to the whole corpus"""
+        key = normalize_word(word)
+        bucket = self.buckets.get(key) if self.known(key) else None
+        if not bucket:
+            key = self.similar_key(word)
+            bucket = self.buckets.get(key) if key is not None else None
+        if bucket:
+            return self.choose(key, bucket)
+        return self.random()
+
+    def stats(self) -> Dict[str, int]:
+        """Entry counts and approximate memory use; safe to call from a worker thread"""
+        pool = self.pool
+        buckets = list(self.buckets.items())
+        seen = set()
+        strings = 0
+        for key, _ in buckets:
+            seen.add(id(key))
+            strings += sys.getsizeof(key)
+        for reply in pool:
+            for value in (reply.word, reply.text):
+                if value is not None and id(value) not in seen:
+                    seen.add(id(value))
+                    strings += sys.getsizeof(value)
+        records = len(pool) * Reply.__basicsize__
+        containers = (
+            sys.getsizeof(pool)
+            + sys.getsizeof(self.buckets)
+            + sum(sys.getsizeof(bucket) for _, bucket in buckets)
+        )
+        bloom = self.bloom
+        total = strings + records + containers + (bloom.nbytes() if bloom is not None else 0)
+        return {
+            "entries": len(pool) - self.removed,
+            "triggers": len(buckets),
+            "bytes": total,
+            "bytes_per_entry": total // len(pool) if pool else 0,
+        }
@@ -0,0 +1,68 @@
+import random
+from typing import Iterable, List
+
+
+class FenwickSampler:
+    """Weighted random index selection over a growable list of weights
+
+    A Fenwick (binary indexed) tree of prefix sums: append, reweighting one
+    entry and sampling are all O(log n), so a bucket never has to be rescanned.
+    """
+
+    __slots__ = ("weights", "tree", "total")
+
+    def __init__(self, weights: Iterable[float] = ()):
+        self.weights: List[float] = list(weights)
+        # Linear-time build: push every node's sum into its parent once
+        tree = [0.0] + self.weights
+        size = len(self.weights)
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.tree = tree
+        self.total = sum(self.weights)
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def append(self, weight: float):
+        self.weights.append(weight)
+        i = len(self.weights)
+        # The new node covers (i - lowbit(i), i]: its own weight plus the
+        # nodes that cover the rest of that range.
+        node = weight
+        step = 1
+        while step < (i & -i):
+            node += self.tree[i - step]
+            step <<= 1
+        self.tree.append(node)
+        self.total += weight
+
+    def update(self, index: int, weight: float):
+        """Set the weight at index"""
+        delta = weight - self.weights[index]
+        if not delta:
+            return
+        self.weights[index] = weight
+        self.total += delta
+        i = index + 1
+        size = len(self.weights)
+        while i <= size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def sample(self, rnd: random.Random = random) -> int:
+        """Pick an index with probability proportional to its weight"""
+        size = len(self.weights)
+        target = rnd.random() * self.total
+        pos = 0
+        step = 1 << size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= size and self.tree[nxt] <= target:
+                pos = nxt
+                target -= self.tree[nxt]
+            step >>= 1
+        # Float drift can leave target just past the last prefix sum
+        return min(pos, size - 1)
@@ -0,0 +1,47 @@
+from typing import Any, Dict, Iterable, Optional
+
+
+class ScopedCollection:
+    """A view of a shared collection limited to the documents of one scope
+
+    Every filter is narrowed to scope and every inserted document carries
+    it, so code written against a collection of its own keeps working
+    against a slice of a shared one. Only the methods below are scoped;
+    anything else should go through collection directly.
+    """
+
+    __slots__ = ("collection", "scope")
+
+    def __init__(self, collection, scope: Dict[str, Any]):
+        self.collection = collection
+        self.scope = scope
+
+    def _filter(self, filter: Optional[dict]) -> dict:
+        return {**(filter or {}), **self.scope}
+
+    def find(self, filter: Optional[dict] = None, *args, **kwargs):
+        return self.collection.find(self._filter(filter), *args, **kwargs)
+
+    async def find_one(self, filter: Optional[dict] = None, *args, **kwargs):
+        return await self.collection.find_one(self._filter(filter), *args, **kwargs)
+
+    async def count_documents(self, filter: Optional[dict] = None, **kwargs) -> int:
+        return await self.collection.count_documents(self._filter(filter), **kwargs)
+
+    async def insert_one(self, document: dict, **kwargs):
+        return await self.collection.insert_one({**document, **self.scope}, **kwargs)
+
+    async def insert_many(self, documents: Iterable[dict], **kwargs):
+        return await self.collection.insert_many([{**doc, **self.scope} for doc in documents], **kwargs)
+
+    async def update_one(self, filter: dict, update: dict, **kwargs):
+        return await self.collection.update_one(self._filter(filter), update, **kwargs)
+
+    async def update_many(self, filter: dict, update: dict, **kwargs):
+        return await self.collection.update_many(self._filter(filter), update, **kwargs)
+
+    async def delete_one(self, filter: dict, **kwargs):
+        return await self.collection.delete_one(self._filter(filter), **kwargs)
+
+    async def delete_many(self, filter: dict, **kwargs):
+        return await self.collection.delete_many(self._filter(filter), **kwargs)
@@ -0,0 +1,167 @@
+import gc
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from nexichat.utils.bloom import BloomFilter
+from nexichat.utils.replyindex import MediaType, Reply
+
+# Layout, little endian:
+#   header   magic, version, flags, record count, string count, heap size, high-water _id, source,
+#            abuse word version the records were filtered against (+1, 0 for none)
+#   lengths  u32 utf-8 length of every distinct string
+#   records  (word string index, text string index, media, uses, replied) per reply
+#   heap     the distinct strings back to back
+#   bloom    optional (HAS_BLOOM flag) Bloom filter over the trigger keys
+# Version 1 records have no counters, versions before 3 have no Bloom filter,
+# versions before 4 no source, versions before 5 no abuse word version.
+MAGIC = b"NXRS"
+VERSION = 5
+PREFIX = struct.Struct("<4sH")
+HEADERS = {version: struct.Struct("<4sHHQQQ12s") for version in (1, 2, 3)}
+HEADERS[4] = struct.Struct("<4sHHQQQ12s16s")
+HEADERS[5] = struct.Struct("<4sHHQQQ12s16sQ")
+HEADER = HEADERS[VERSION]
+RECORDS = {1: struct.Struct("<IIB"), **{version: struct.Struct("<IIBII") for version in (2, 3, 4, 5)}}
+RECORD = RECORDS[VERSION]
+SOURCE_SIZE = 16
+NONE = 0xFFFFFFFF
+HAS_BLOOM = 1
+MEDIA = tuple(MediaType)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def write_snapshot(path: str, replies: Iterable[Reply], high_water: Optional[bytes] = None,
+                   bloom: Optional[bytes] = None, source: bytes = b"", filtered: Optional[int] = None) -> int:
+    """Atomically replace the snapshot at path, returns the record count
+
+    bloom is a serialized BloomFilter over the normalized triggers of replies,
+    source identifies the database they were read from, zero padded to 16 bytes,
+    filtered the abuse word version replies were last checked against.
+    """
+    if len(source) > SOURCE_SIZE:
+        raise ValueError(f"source is longer than {SOURCE_SIZE} bytes")
+    ids: Dict[str, int] = {}
+    lengths = array("I")
+    heap = bytearray()
+    table = bytearray()
+
+    def place(value: Optional[str]) -> int:
+        if value is None:
+            return NONE
+        index = ids.get(value)
+        if index is None:
+            data = value.encode("utf-8", "surrogatepass")
+            index = ids[value] = len(lengths)
+            lengths.append(len(data))
+            heap.extend(data)
+        return index
+
+    count = 0
+    for reply in replies:
+        table.extend(RECORD.pack(
+            place(reply.word), place(reply.text), reply.media,
+            min(reply.uses, NONE), min(reply.replied, NONE),
+        ))
+        count += 1
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        flags = HAS_BLOOM if bloom else 0
+        f.write(HEADER.pack(
+            MAGIC, VERSION, flags, count, len(lengths), len(heap), high_water or bytes(12), source,
+            0 if filtered is None else filtered + 1,
+        ))
+        f.write(lengths.tobytes())
+        f.write(table)
+        f.write(heap)
+        if bloom:
+            f.write(bloom)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return count
+
+
+def read_snapshot(path: str) -> Tuple[List[Reply], Optional[bytes], Optional[BloomFilter], Optional[bytes],
+                                       Optional[int]]:
+    """Map the snapshot at path and decode its records, high-water _id, Bloom filter, source
+    and abuse word version
+
+    The source and version are None for snapshots written before they were recorded.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if len(mm) < PREFIX.size:
+            raise SnapshotError("truncated header")
+        magic, version = PREFIX.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise SnapshotError("not a reply snapshot")
+        header = HEADERS.get(version)
+        record = RECORDS.get(version)
+        if header is None or record is None:
+            raise SnapshotError(f"unsupported snapshot version {version}")
+        if len(mm) < header.size:
+            raise SnapshotError("truncated header")
+        fields = header.unpack_from(mm, 0)
+        flags, count, string_count, heap_size, high_water = fields[2:7]
+        source = fields[7] if version >= 4 else None
+        filtered = fields[8] - 1 if version >= 5 and fields[8] else None
+        table_start = header.size + string_count * 4
+        heap_start = table_start + count * record.size
+        heap_end = heap_start + heap_size
+        bloom = None
+        if version >= 3 and flags & HAS_BLOOM:
+            try:
+                bloom = BloomFilter.from_bytes(mm[heap_end:])
+            except (struct.error, ValueError) as e:
+                raise SnapshotError(f"bad bloom filter: {e}")
+            # from_bytes checks the size, so the filter runs to the end of the file
+            heap_end = len(mm)
+        if len(mm) != heap_end:
+            raise SnapshotError("truncated snapshot")
+
+        lengths = array("I")
+        lengths.frombytes(mm[header.size:table_start])
+        if sum(lengths) != heap_size:
+            raise SnapshotError("string lengths do not match the heap")
+        # Millions of small allocations; collecting midway only costs time.
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            strings = []
+            offset = heap_start
+            for length in lengths:
+                strings.append(sys.intern(mm[offset:offset + length].decode("utf-8", "surrogatepass")))
+                offset += length
+
+            table = mm[table_start:heap_start]
+            try:
+                if version == 1:
+                    replies = [
+                        Reply(None if word == NONE else strings[word], None if text == NONE else strings[text],
+                              MEDIA[media])
+                        for word, text, media in record.iter_unpack(table)
+                    ]
+                else:
+                    replies = [
+                        Reply(None if word == NONE else strings[word], None if text == NONE else strings[text],
+                              MEDIA[media], uses, replied)
+                        for word, text, media, uses, replied in record.iter_unpack(table)
+                    ]
+            except IndexError:
+                raise SnapshotError("record points outside the string table or media types")
+        except UnicodeDecodeError as e:
+            raise SnapshotError(f"bad string: {e}")
+        finally:
+            if enabled:
+                gc.enable()
+    return replies, None if high_water == bytes(12) else high_water, bloom, source, filtered
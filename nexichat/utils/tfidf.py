@@ -0,0 +1,116 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from nexichat.utils.fuzzy import fuzzy_key, trigrams
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # numpy/scipy are only needed for REPLY_STRATEGY=tfidf
+    np = None
+    sparse = None
+
+
+class TfidfIndex:
+    """Character-trigram TF-IDF vectors of trigger words in a CSR matrix
+
+    New trigger words are queued and folded in by rebuild(), which only
+    vectorizes the queued words and stacks them under the existing rows;
+    the IDF weights and row norms are then recomputed with NumPy.
+    """
+
+    available = np is not None
+
+    def __init__(self, batch_size: int = 1000):
+        if not self.available:
+            raise RuntimeError("numpy and scipy are required for the tfidf strategy")
+        self.batch_size = batch_size
+        self.vocab: Dict[str, int] = {}
+        self.pending: List[str] = []
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.df = np.zeros(0, dtype=np.int64)
+        # (transposed normalized matrix, idf, row labels), swapped in one assignment
+        self.state = (sparse.csr_matrix((0, 0), dtype=np.float32), np.zeros(0, dtype=np.float32), [])
+
+    def __len__(self) -> int:
+        return len(self.state[2])
+
+    def add(self, label: str):
+        if label:
+            self.pending.append(label)
+
+    def needs_rebuild(self) -> bool:
+        return len(self.pending) >= self.batch_size or (bool(self.pending) and not len(self))
+
+    def take_pending(self) -> List[str]:
+        pending, self.pending = self.pending, []
+        return pending
+
+    def _vectorize(self, texts: Sequence[str], grow: bool):
+        indptr = [0]
+        indices: List[int] = []
+        for text in texts:
+            for gram in trigrams(fuzzy_key(text)):
+                column = self.vocab.get(gram)
+                if column is None:
+                    if not grow:
+                        continue
+                    column = self.vocab[gram] = len(self.vocab)
+                indices.append(column)
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float32)
+        return sparse.csr_matrix(
+            (data, np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(texts), len(self.vocab)),
+        )
+
+    def rebuild(self, labels: List[str]):
+        """Fold queued trigger words into the matrix; safe to run in a worker thread"""
+        labels = [label for label in labels if fuzzy_key(label)]
+        if not labels:
+            return
+        rows = self._vectorize(labels, grow=True)
+        counts = self.counts
+        counts.resize((counts.shape[0], len(self.vocab)))
+        counts = sparse.vstack([counts, rows], format="csr")
+
+        df = np.zeros(len(self.vocab), dtype=np.int64)
+        df[: len(self.df)] = self.df
+        df += np.bincount(rows.indices, minlength=len(self.vocab))
+        idf = (np.log((1 + counts.shape[0]) / (1 + df)) + 1).astype(np.float32)
+
+        matrix = counts.multiply(idf).tocsr()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        matrix = sparse.diags(1 / norms).dot(matrix).astype(np.float32).tocsr()
+
+        self.counts, self.df = counts, df
+        self.state = (matrix.T.tocsr(), idf, self.state[2] + labels)
+
+    def search_batch(self, texts: Sequence[str], threshold: float = 0.4) -> List[Optional[Tuple[float, str]]]:
+        """Best (cosine score, label) per text, or None below threshold"""
+        matrix_t, idf, labels = self.state
+        if not texts or not labels:
+            return [None] * len(texts)
+        queries = self._vectorize(texts, grow=False)
+        queries.resize((len(texts), len(idf)))
+        queries = queries.multiply(idf).tocsr()
+        norms = np.sqrt(np.asarray(queries.multiply(queries).sum(axis=1)).ravel())
+        scores = queries.dot(matrix_t).tocsr()
+
+        results: List[Optional[Tuple[float, str]]] = []
+        for row in range(len(texts)):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            if start == end or not norms[row]:
+                results.append(None)
+                continue
+            best = start + int(np.argmax(scores.data[start:end]))
+            score = float(scores.data[best]) / norms[row]
+            results.append((score, labels[scores.indices[best]]) if score >= threshold else None)
+        return results
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the matrices"""
+        matrix, idf, _ = self.state
+        return sum(
+            m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in (self.counts, matrix)
+        ) + self.df.nbytes + idf.nbytes
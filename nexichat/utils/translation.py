@@ -0,0 +1,215 @@
+import asyncio
+import inspect
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple, Type
+
+from nexichat.utils.circuit import CircuitBreaker
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TranslationBackend(ABC):
+    """Translates batches of texts into one target language
+
+    translate_batch returns one entry per text, None where that text could
+    not be translated, and raises when the whole call failed. Callers send
+    at most max_batch texts per call.
+    """
+
+    name = ""
+    max_batch = 1
+
+    def __init__(self, workers: int = 4, **options):
+        # options a backend does not use are ignored, so config can pass them all
+        self.workers = workers
+        self.running = 0  # calls still occupying the backend, including abandoned ones
+
+    @property
+    def busy(self) -> bool:
+        """True when the backend should not be given more work for now"""
+        return False
+
+    @abstractmethod
+    async def translate_batch(self, texts: List[str], lang: str) -> List[Optional[str]]:
+        ...
+
+
+class GoogleBackend(TranslationBackend):
+    """deep_translator's GoogleTranslator on a thread pool
+
+    The endpoint takes one text per request, so single-line texts of a
+    batch are sent joined by newlines and split again; if the line count
+    does not survive the round trip they are sent one by one. A call
+    abandoned by its caller (e.g. on timeout) keeps its thread until the
+    request returns, so busy caps how many may be outstanding.
+    """
+
+    name = "google"
+    max_batch = 16
+    # deep_translator refuses texts over 5000 characters
+    MAX_CHARS = 4500
+
+    def __init__(self, workers: int = 4, **options):
+        super().__init__(workers)
+        from deep_translator import GoogleTranslator
+        self._translator = GoogleTranslator
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="translate")
+
+    @property
+    def busy(self) -> bool:
+        return self.running >= self.workers * 4
+
+    def _translate(self, texts: List[str], lang: str) -> List[Optional[str]]:
+        translator = self._translator(source="auto", target=lang)
+        results: List[Optional[str]] = [None] * len(texts)
+        rest = range(len(texts))
+        single = [i for i, text in enumerate(texts) if "\n" not in text]
+        if len(single) > 1 and sum(len(texts[i]) + 1 for i in single) <= self.MAX_CHARS:
+            try:
+                lines = (translator.translate("\n".join(texts[i] for i in single)) or "").split("\n")
+            except Exception:
+                # One bad text fails the joined request; the texts are retried one by one
+                lines = []
+            if len(lines) == len(single):
+                for i, line in zip(single, lines):
+                    results[i] = line.strip() or None
+                rest = [i for i, text in enumerate(texts) if "\n" in text]
+        error = None
+        for i in rest:
+            try:
+                results[i] = translator.translate(texts[i]) or None
+            except Exception as e:
+                error = e
+        if error is not None and not any(results):
+            raise error
+        return results
+
+    def _finished(self):
+        self.running -= 1
+
+    async def translate_batch(self, texts: List[str], lang: str) -> List[Optional[str]]:
+        loop = asyncio.get_running_loop()
+        self.running += 1
+        job = self._pool.submit(self._translate, texts, lang)
+        # Counted down when the thread is done, not when the caller gives up
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._finished))
+        return await asyncio.wrap_future(job)
+
+
+class LocalBackend(TranslationBackend):
+    """Deterministic offline stand-in for load tests and benchmarks
+
+    Tags each text with its target language after a fixed simulated round
+    trip, so the reply pipeline can be exercised without network access.
+    """
+
+    name = "local"
+    max_batch = 64
+
+    def __init__(self, workers: int = 4, latency: float = 0.0, **options):
+        super().__init__(workers)
+        self.latency = latency
+
+    async def translate_batch(self, texts: List[str], lang: str) -> List[Optional[str]]:
+        self.running += 1
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return [f"[{lang}] {text}" for text in texts]
+        finally:
+            self.running -= 1
+
+
+class BatchQueue:
+    """Collects concurrent single-text requests into batch calls per language
+
+    The first request for a language opens a window of window seconds;
+    requests for that language arriving meanwhile ride the same
+    translate_batch call, which goes out early once max_batch are waiting.
+    Backends that take one text per call are called right away.
+
+    Each backend call is bounded by timeout and reported once to breaker,
+    however many requests it carried; a failed call fails all of them.
+    """
+
+    def __init__(self, backend: TranslationBackend, window: float = 0.005,
+                 breaker: Optional[CircuitBreaker] = None, timeout: Optional[float] = None):
+        self.backend = backend
+        self.window = window
+        self.breaker = breaker
+        self.timeout = timeout
+        self.pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self.calls = 0
+        self.texts = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def translate(self, text: str, lang: str) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self.pending.get(lang)
+        if batch is None:
+            batch = self.pending[lang] = []
+            if self.backend.max_batch > 1:
+                loop.call_later(self.window, self._flush, lang, batch)
+        batch.append((text, future))
+        if len(batch) >= self.backend.max_batch:
+            self._flush(lang, batch)
+        return await future
+
+    def _flush(self, lang: str, batch: List[Tuple[str, asyncio.Future]]):
+        # The window timer of a batch already sent by size finds it gone
+        if self.pending.get(lang) is not batch:
+            return
+        del self.pending[lang]
+        task = asyncio.get_running_loop().create_task(self._send(lang, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, lang: str, batch: List[Tuple[str, asyncio.Future]]):
+        # Requests whose caller gave up while waiting are left out
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+        self.calls += 1
+        self.texts += len(batch)
+        try:
+            results = await asyncio.wait_for(
+                self.backend.translate_batch([text for text, _ in batch], lang), self.timeout
+            )
+        except Exception as e:
+            if self.breaker is not None:
+                self.breaker.failure()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if self.breaker is not None:
+            self.breaker.success()
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+BACKENDS: Dict[str, Type[TranslationBackend]] = {}
+
+
+def register_backend(backend: Type[TranslationBackend]) -> Type[TranslationBackend]:
+    if inspect.isabstract(backend):
+        raise TypeError(f"{backend.__name__} does not implement {', '.join(sorted(backend.__abstractmethods__))}")
+    BACKENDS[backend.name] = backend
+    return backend
+
+
+register_backend(GoogleBackend)
+register_backend(LocalBackend)
+
+
+def make_backend(name: str, **options) -> TranslationBackend:
+    """Create the backend registered under name, Google if there is none"""
+    backend = BACKENDS.get(name)
+    if backend is None:
+        LOGGER.warning(f"Unknown translation backend {name!r}, using google")
+        backend = GoogleBackend
+    return backend(**options)
@@ -0,0 +1,58 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+MISSING = object()
+
+
+class TTLCache:
+    """Bounded mapping whose entries expire, with a shorter life for absent values
+
+    None is stored like any value and stands for "known to be unset"; it
+    lives negative_ttl seconds instead of ttl, so a setting made elsewhere
+    shows up sooner. get returns MISSING when there is nothing fresh.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, max_size: int = 100_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._clock = clock
+        self.entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Any:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            self.misses += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        if entry[1] is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        ttl = self.negative_ttl if value is None else self.ttl
+        self.entries[key] = (self._clock() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self.entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+        }
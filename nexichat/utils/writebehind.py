@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+
+class WriteBehind:
+    """Deduplicating write buffer flushed in batches on size or age
+
+    flush receives the queued documents and writes them in one round trip.
+    A batch that fails outright is queued again, up to max_pending documents.
+    The background flusher only runs while documents are queued, so idle
+    buffers (one per clone for served ids) cost no timers. With merge, a document put under an already queued key is folded into
+    the queued one instead of being dropped.
+    """
+
+    def __init__(self, name: str, flush: Callable[[List[dict]], Awaitable[None]],
+                 max_size: int = 200, max_delay: float = 5.0, max_pending: int = 10_000,
+                 merge: Optional[Callable[[dict, dict], None]] = None):
+        self.name = name
+        self._flush = flush
+        self._merge = merge
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.pending: Dict[Hashable, dict] = {}
+        self.flushed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.last_latency = 0.0
+        self.total_latency = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.pending
+
+    def put(self, key: Hashable, doc: dict) -> bool:
+        """Queue a document, returns False if one with the same key is already queued"""
+        queued = self.pending.get(key)
+        if queued is not None:
+            if self._merge is not None:
+                self._merge(queued, doc)
+            return False
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self.pending[key] = doc
+        self._start()
+        if len(self.pending) >= self.max_size:
+            self._wakeup.set()
+        return True
+
+    def _start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            # Kept across restarts: a flush() called directly may hold it
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # close() cancels this loop; an in-flight batch still completes
+            await asyncio.shield(self.flush())
+            # The next put starts it again
+            if not self.pending:
+                return
+
+    async def flush(self) -> int:
+        """Write everything queued so far, returns the number of documents written"""
+        if not self.pending:
+            return 0
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            batch, self.pending = self.pending, {}
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            try:
+                await self._flush(list(batch.values()))
+            except Exception as e:
+                self.failed += 1
+                LOGGER.error(f"Error flushing {len(batch)} {self.name}: {e}")
+                room = self.max_pending - len(self.pending)
+                for key, doc in list(batch.items())[:max(room, 0)]:
+                    queued = self.pending.get(key)
+                    if queued is None:
+                        self.pending[key] = doc
+                    elif self._merge is not None:
+                        self._merge(queued, doc)
+                self.dropped += max(len(batch) - max(room, 0), 0)
+                return 0
+            self.last_latency = time.perf_counter() - start
+            self.total_latency += self.last_latency
+            self.flushes += 1
+            self.flushed += len(batch)
+            return len(batch)
+
+    async def close(self):
+        """Stop the background flusher and write what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "depth": len(self.pending),
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "last_latency": self.last_latency,
+            "avg_latency": self.total_latency / self.flushes if self.flushes else 0.0,
+        }